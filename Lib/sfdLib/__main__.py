@@ -1,32 +1,327 @@
+from __future__ import print_function
+
 import argparse
+import errno
+import glob
+import os
+import shlex
+import sys
+import time
+
+try:
+    from StringIO import StringIO
+except ImportError: # Python 3
+    from io import StringIO
+
+
+def convert(sfdfile, ufofile, ignore_uvs=False, ufo_anchors=False,
+            fontforge=False, jobs=1, cache_dir=None, cache_size=512,
+            incremental=False, timings=False, memory=False,
+            memory_limit=None, hooks=None):
+    """Convert sfdfile to ufofile, the arguments are the command line
+    options. hooks is a list of PhaseHook objects notified of the conversion
+    phases.
+
+    If ufofile ends with .otf or .ttf, an OpenType font is built straight from
+    the parsed font instead, see build.buildFont().
+    """
+    from .instrument import PhaseMemory, PhaseTimer
+
+    hooks = list(hooks or [])
+    if timings:
+        timer = PhaseTimer()
+        hooks.append(timer)
+    if memory:
+        tracer = PhaseMemory()
+        hooks.append(tracer)
+
+    try:
+        _convert(sfdfile, ufofile, ignore_uvs, ufo_anchors, fontforge, jobs,
+                 cache_dir, cache_size, incremental, memory_limit, hooks)
+    except (MemoryError, EnvironmentError) as e:
+        outOfMemory = isinstance(e, MemoryError) or e.errno == errno.ENOMEM
+        if not memory_limit or not outOfMemory:
+            raise
+        where = ""
+        if getattr(e, "phase", None):
+            where = " in the %s phase" % e.phase
+        raise MemoryError("Ran out of memory%s, the limit is %d MB"
+                          % (where, memory_limit))
+    finally:
+        if memory:
+            tracer.stop()
+
+    if timings or memory:
+        # Write the reports at once, fonts may be converted in parallel.
+        out = StringIO()
+        print("%s:" % sfdfile, file=out)
+        if timings:
+            timer.report(out)
+        if memory:
+            tracer.report(out)
+        sys.stderr.write(out.getvalue())
+
+
+def _convert(sfdfile, ufofile, ignore_uvs, ufo_anchors, fontforge, jobs,
+             cache_dir, cache_size, incremental, memory_limit, hooks):
+    from defcon import Font
+    from .instrument import limitMemory, phase
+    if incremental:
+        from .incremental import updateUFO
+    elif fontforge:
+        from .native import SFDParser
+    else:
+        from .parser import SFDParser
+
+    binary = isOpenType(ufofile)
+    if binary:
+        from .build import buildFont
+
+    # Some modules reserve a lot of address space when imported, so only
+    # limit the memory after importing them, including those the parser
+    # imports when first needed.
+    if memory_limit:
+        if not fontforge:
+            from .parser import preloadModules
+            preloadModules(fea_ast=binary)
+        limitMemory(memory_limit * 1024 * 1024)
+
+    if incremental:
+        updateUFO(sfdfile, ufofile, ignore_uvs, ufo_anchors, hooks)
+        return
+
+    font = Font()
+    if fontforge:
+        parser = SFDParser(sfdfile, font, ignore_uvs, ufo_anchors, hooks=hooks,
+                           fea_ast=binary)
+    else:
+        cache = None
+        if cache_dir:
+            from .cache import ParseCache
+            cache = ParseCache(cache_dir, cache_size * 1024 * 1024)
+        parser = SFDParser(sfdfile, font, ignore_uvs, ufo_anchors, jobs, cache,
+                           hooks, fea_ast=binary)
+    parser.parse()
+
+    if binary:
+        ttf = ufofile.lower().endswith(".ttf")
+        font = buildFont(font, parser.featureFile, ttf, hooks)
+
+    with phase(hooks, "save"):
+        font.save(ufofile)
 
-from defcon import Font
+
+def isOpenType(path):
+    """Return whether path is an OpenType font to build rather than a UFO."""
+    return os.path.splitext(path)[1].lower() in (".otf", ".ttf")
+
+
+def _convertTask(task):
+    sfdfile, ufofile, options = task
+    start = time.time()
+    error = None
+    try:
+        convert(sfdfile, ufofile, **options)
+    except Exception as e:
+        error = "%s: %s" % (type(e).__name__, e)
+    return sfdfile, ufofile, time.time() - start, error
+
+
+def convertBatch(pairs, jobs=1, **options):
+    """Convert a list of (sfdfile, ufofile) pairs with the convert() options,
+    in jobs worker processes that are kept around for the whole batch.
+
+    A failing font does not stop the others. Returns a (sfdfile, ufofile,
+    seconds, error) tuple per pair, in order, where error is None if the
+    conversion succeeded.
+    """
+    tasks = [(sfdfile, ufofile, options) for sfdfile, ufofile in pairs]
+    if jobs > 1 and len(tasks) > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(min(jobs, len(tasks)))
+        try:
+            return pool.map(_convertTask, tasks, chunksize=1)
+        finally:
+            pool.terminate()
+            pool.join()
+    return [_convertTask(task) for task in tasks]
+
+
+def _readBatchFile(path):
+    """Read input and output font pairs, one pair per line. Blank lines and
+    comments starting with # are ignored, paths with spaces can be quoted."""
+    pairs = []
+    with open(path) as fp:
+        for i, line in enumerate(fp, 1):
+            pair = shlex.split(line, comments=True)
+            if not pair:
+                continue
+            if len(pair) != 2:
+                raise ValueError("%s:%d: expected an input and an output font"
+                                 % (path, i))
+            pairs.append(tuple(pair))
+    return pairs
+
+
+def _printSummary(results):
+    failed = 0
+    for sfdfile, ufofile, seconds, error in results:
+        if error is None:
+            print("%8.2fs  %s -> %s" % (seconds, sfdfile, ufofile))
+        else:
+            failed += 1
+            print("%8.2fs  %s FAILED: %s" % (seconds, sfdfile, error))
+    total = sum(r[2] for r in results)
+    print("%d converted, %d failed, %.2fs total" % (len(results) - failed,
+                                                     failed, total))
+    return failed
 
 
 def main():
     parser = argparse.ArgumentParser(
         prog="sfd2ufo", description="Convert FontForge fonts to UFO.")
-    parser.add_argument("sfdfile", metavar="FILE", help="input font to process")
-    parser.add_argument("ufofile", metavar="FILE", help="output font to write")
+    parser.add_argument("files", metavar="FILE", nargs="*",
+        help="input font to process followed by the output font to write, "
+             "several such pairs can be given. Output fonts ending with .otf "
+             "or .ttf are built straight to OpenType, for test builds")
+    parser.add_argument("--batch", metavar="FILE",
+        help="also convert the input and output font pairs listed in FILE, "
+             "one pair per line")
+    parser.add_argument("--glob", metavar="PATTERN",
+        help="also convert the input fonts matching PATTERN into "
+             "--output-dir")
+    parser.add_argument("-o", "--output-dir", metavar="DIR",
+        help="directory to write the fonts matched by --glob to")
     parser.add_argument("--ignore-uvs", action="store_true",
         help="don’t error if the font uses Unicode variation selectors")
     parser.add_argument("--ufo-anchors", action="store_true",
         help="output UFO anchors instead of writing them to feature file")
     parser.add_argument("--fontforge", action="store_true",
         help="use FontForge’s Python module instead of our own SFD parser")
+    parser.add_argument("-j", "--jobs", metavar="N", type=int, default=1,
+        help="parse glyphs in N worker processes, or when converting several "
+             "fonts, convert them in N worker processes (default: 1)")
+    parser.add_argument("--cache-dir", metavar="DIR",
+        help="cache parsed fonts in DIR and reuse them for unchanged fonts")
+    parser.add_argument("--cache-size", metavar="MB", type=int, default=512,
+        help="maximum size of the cache directory (default: 512)")
+    parser.add_argument("--incremental", action="store_true",
+        help="only re-convert the glyphs that changed since the last "
+             "conversion to the same output font")
+    parser.add_argument("--timings", action="store_true",
+        help="print the wall time, CPU time and object count of each "
+             "conversion phase")
+    parser.add_argument("--memory", action="store_true",
+        help="print the peak and retained memory of each conversion phase")
+    parser.add_argument("--memory-limit", metavar="MB", type=int,
+        help="fail when a conversion needs more than MB megabytes of memory")
+    parser.add_argument("--profile", metavar="FILE",
+        help="write cProfile statistics of the whole run to FILE")
+    parser.add_argument("--watch", action="store_true",
+        help="keep running and incrementally update the output fonts "
+             "whenever the input fonts change, implies --incremental")
+    parser.add_argument("--interval", metavar="SECONDS", type=float,
+        default=0.5, help="how often --watch checks the input fonts for "
+                          "changes (default: 0.5)")
 
     args = parser.parse_args()
 
-    if args.fontforge:
-        from .native import SFDParser
-    else:
-        from .parser import SFDParser
+    if len(args.files) % 2:
+        parser.error("every input font needs an output font")
+    pairs = list(zip(args.files[::2], args.files[1::2]))
+    if args.batch:
+        try:
+            pairs += _readBatchFile(args.batch)
+        except (IOError, OSError, ValueError) as e:
+            parser.error(str(e))
+    matched = []
+    if args.glob:
+        if not args.output_dir:
+            parser.error("--glob requires --output-dir")
+        matched = sorted(glob.glob(args.glob))
+        for sfdfile in matched:
+            name = os.path.splitext(os.path.basename(sfdfile.rstrip(os.sep)))[0]
+            pairs.append((sfdfile, os.path.join(args.output_dir, name + ".ufo")))
+    if not pairs:
+        parser.error("no fonts to convert")
 
-    font = Font()
-    parser = SFDParser(args.sfdfile, font, args.ignore_uvs, args.ufo_anchors)
-    parser.parse()
+    batch = len(pairs) > 1 or args.batch or args.glob
+
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.fontforge and args.cache_dir:
+        parser.error("--cache-dir can’t be used with --fontforge")
+    if args.incremental and (args.fontforge or args.cache_dir):
+        parser.error("--incremental can’t be used with --fontforge or "
+                     "--cache-dir")
+    if args.watch and (args.fontforge or args.cache_dir or args.jobs > 1):
+        parser.error("--watch can’t be used with --fontforge, --cache-dir "
+                     "or --jobs")
+    if args.memory_limit is not None:
+        from .instrument import canLimitMemory
+        if not canLimitMemory():
+            parser.error("--memory-limit is not supported on this platform")
+        if args.memory_limit < 1:
+            parser.error("--memory-limit must be at least 1")
+    if args.profile and args.jobs > 1:
+        parser.error("--profile can’t be used with --jobs")
+    if args.profile and args.watch:
+        parser.error("--profile can’t be used with --watch")
+    if any(isOpenType(ufofile) for _, ufofile in pairs):
+        if args.incremental or args.watch or args.ufo_anchors:
+            parser.error("--incremental, --watch and --ufo-anchors can’t be "
+                         "used when building OpenType fonts")
+    if not batch and args.jobs > 1 and (args.fontforge or args.incremental):
+        parser.error("--jobs can’t be used with --fontforge or --incremental "
+                     "when converting a single font")
+
+    options = dict(ignore_uvs=args.ignore_uvs, ufo_anchors=args.ufo_anchors,
+                   fontforge=args.fontforge, cache_dir=args.cache_dir,
+                   cache_size=args.cache_size, incremental=args.incremental,
+                   timings=args.timings, memory=args.memory,
+                   memory_limit=args.memory_limit)
+
+    # Only once the arguments are known to be good, and there is something
+    # to write to it.
+    if matched and not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    if args.watch:
+        from .watch import watch
+        if args.memory_limit:
+            from .instrument import limitMemory
+            from .parser import preloadModules
+            preloadModules()
+            limitMemory(args.memory_limit * 1024 * 1024)
+        try:
+            watch(pairs, args.interval, args.ignore_uvs, args.ufo_anchors,
+                  timings=args.timings, memory=args.memory)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    profile = None
+    if args.profile:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+
+    try:
+        if not batch:
+            sfdfile, ufofile = pairs[0]
+            convert(sfdfile, ufofile, jobs=args.jobs, **options)
+            return
+
+        # Worker processes can’t have workers of their own, so glyphs are
+        # parsed serially and --jobs applies to fonts instead.
+        results = convertBatch(pairs, args.jobs, **options)
+    finally:
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(args.profile)
 
-    font.save(args.ufofile)
+    if _printSummary(results):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,363 @@
+#
+# encoding: utf-8
+
+from __future__ import print_function, division
+from fontTools.misc.py23 import *
+
+import calendar
+import time
+
+from defcon import Glyph
+from fontTools.feaLib import ast
+from fontTools.feaLib.builder import Builder
+from fontTools.feaLib.parser import Parser
+from fontTools.fontBuilder import FontBuilder
+from fontTools.misc.fixedTools import otRound
+from fontTools.misc.timeTools import timestampSinceEpoch
+from fontTools.pens.recordingPen import DecomposingRecordingPen
+from fontTools.pens.reverseContourPen import ReverseContourPen
+from fontTools.pens.t2CharStringPen import T2CharStringPen
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+try:
+    from fontTools.pens.cu2quPen import Cu2QuPen
+except ImportError: # fontTools < 4.7, or Python 2
+    from cu2qu.pens import Cu2QuPen
+
+from .instrument import phase
+
+# The maximum error, in font units, of the quadratic curves cubic outlines
+# are converted to for TrueType fonts.
+MAX_ERR = 1.0
+
+# OS/2 fields and the font info attributes they are set from.
+_OS2_INFO = (
+    ("usWeightClass", "openTypeOS2WeightClass"),
+    ("usWidthClass", "openTypeOS2WidthClass"),
+    ("sTypoLineGap", "openTypeOS2TypoLineGap"),
+    ("ySubscriptXSize", "openTypeOS2SubscriptXSize"),
+    ("ySubscriptYSize", "openTypeOS2SubscriptYSize"),
+    ("ySubscriptXOffset", "openTypeOS2SubscriptXOffset"),
+    ("ySubscriptYOffset", "openTypeOS2SubscriptYOffset"),
+    ("ySuperscriptXSize", "openTypeOS2SuperscriptXSize"),
+    ("ySuperscriptYSize", "openTypeOS2SuperscriptYSize"),
+    ("ySuperscriptXOffset", "openTypeOS2SuperscriptXOffset"),
+    ("ySuperscriptYOffset", "openTypeOS2SuperscriptYOffset"),
+    ("yStrikeoutSize", "openTypeOS2StrikeoutSize"),
+    ("yStrikeoutPosition", "openTypeOS2StrikeoutPosition"),
+    ("sxHeight", "xHeight"),
+    ("sCapHeight", "capHeight"),
+)
+
+_PANOSE_FIELDS = ("bFamilyType", "bSerifStyle", "bWeight", "bProportion",
+                  "bContrast", "bStrokeVariation", "bArmStyle", "bLetterForm",
+                  "bMidline", "bXHeight")
+
+# CFF private dict keys and the font info attributes they are set from.
+_PRIVATE_INFO = (
+    ("BlueValues", "postscriptBlueValues"),
+    ("OtherBlues", "postscriptOtherBlues"),
+    ("FamilyBlues", "postscriptFamilyBlues"),
+    ("FamilyOtherBlues", "postscriptFamilyOtherBlues"),
+    ("BlueScale", "postscriptBlueScale"),
+    ("BlueShift", "postscriptBlueShift"),
+    ("BlueFuzz", "postscriptBlueFuzz"),
+    ("StemSnapH", "postscriptStemSnapH"),
+    ("StemSnapV", "postscriptStemSnapV"),
+    ("ForceBold", "postscriptForceBold"),
+)
+
+
+def _value(value, default):
+    return default if value is None else value
+
+
+def _bits(bits):
+    return sum(1 << bit for bit in bits or [])
+
+
+def _isQuadratic(glyphs):
+    """Return whether the outlines of glyphs are quadratic, judging by the
+    first curve found."""
+    for glyph in glyphs:
+        for contour in glyph:
+            for point in contour:
+                if point.segmentType == "qcurve":
+                    return True
+                if point.segmentType == "curve":
+                    return False
+    return False
+
+
+def _ttGlyphs(font, glyphs, glyphOrder, quadratic):
+    ttGlyphs = {}
+    for name in glyphOrder:
+        glyph = glyphs[name]
+        pen = TTGlyphPen(glyphs)
+        drawPen = pen
+        if not quadratic:
+            # PostScript outlines run in the opposite direction.
+            drawPen = Cu2QuPen(pen, MAX_ERR, reverse_direction=True)
+        if len(glyph) and glyph.components:
+            # TrueType glyphs can’t have both contours and components.
+            recording = DecomposingRecordingPen(font)
+            glyph.draw(recording)
+            recording.replay(drawPen)
+        else:
+            glyph.draw(drawPen)
+        ttGlyphs[name] = pen.glyph()
+    return ttGlyphs
+
+
+def _charStrings(font, glyphs, glyphOrder, quadratic):
+    charStrings = {}
+    for name in glyphOrder:
+        glyph = glyphs[name]
+        pen = T2CharStringPen(otRound(glyph.width), None)
+        drawPen = pen
+        if quadratic:
+            # TrueType outlines run in the opposite direction.
+            drawPen = ReverseContourPen(pen)
+        recording = DecomposingRecordingPen(font)
+        glyph.draw(recording)
+        recording.replay(drawPen)
+        charStrings[name] = pen.getCharString()
+    return charStrings
+
+
+def _langSystems(featureFile):
+    """Return the script and language pairs the features of featureFile are
+    registered for."""
+    langSystems = []
+    for block in featureFile.statements:
+        if not isinstance(block, ast.FeatureBlock):
+            continue
+        script = None
+        for statement in block.statements:
+            if isinstance(statement, ast.ScriptStatement):
+                script = statement.script
+            elif isinstance(statement, ast.LanguageStatement) and script:
+                if (script, statement.language) not in langSystems:
+                    langSystems.append((script, statement.language))
+    return sorted(langSystems, key=lambda s: (s[0], s[1] != "dflt", s[1]))
+
+
+def _kernStatements(font, featureFile):
+    """Return the statements of a kern feature with the UFO kerning of font,
+    for the same scripts and languages as the other features."""
+    kerning = font.kerning
+    if not kerning:
+        return []
+
+    groups = font.groups
+    classes = {}
+    statements = []
+
+    def glyphs(name):
+        if name not in groups:
+            return ast.GlyphName(name)
+        if name not in classes:
+            className = name
+            if className.startswith("public."):
+                className = className[len("public."):]
+            definition = ast.GlyphClassDefinition(
+                className, ast.GlyphClass(list(groups[name])))
+            statements.append(definition)
+            classes[name] = ast.GlyphClassName(definition)
+        return classes[name]
+
+    # Glyph pairs first so that they override class pairs.
+    pairs = [[], [], []]
+    for (first, second), value in sorted(kerning.items()):
+        pairs[(first in groups) + (second in groups)].append(
+            (first, second, value))
+
+    lookup = ast.LookupBlock("kern_ufo")
+    for i, rules in enumerate(pairs):
+        for first, second, value in rules:
+            lookup.statements.append(ast.PairPosStatement(
+                glyphs(first), ast.ValueRecord(xAdvance=otRound(value)),
+                glyphs(second), None, enumerated=i == 1))
+    statements.append(lookup)
+
+    feature = ast.FeatureBlock("kern")
+    langSystems = _langSystems(featureFile)
+    if not langSystems:
+        feature.statements.append(ast.LookupReferenceStatement(lookup))
+    script = None
+    for tag, language in langSystems:
+        if tag != script:
+            script = tag
+            feature.statements.append(ast.ScriptStatement(script))
+        feature.statements.append(ast.LanguageStatement(
+            language, include_default=language == "dflt"))
+        feature.statements.append(ast.LookupReferenceStatement(lookup))
+    statements.append(feature)
+
+    return statements
+
+
+def _buildFeatures(ttFont, font, featureFile):
+    if featureFile is None:
+        featureFile = ast.FeatureFile()
+        if font.features.text:
+            parser = Parser(UnicodeIO(tounicode(font.features.text)),
+                            glyphNames=font.keys())
+            featureFile = parser.parse()
+
+    kern = _kernStatements(font, featureFile)
+    if kern:
+        # Don’t modify the caller’s syntax tree.
+        doc = ast.FeatureFile()
+        doc.statements = featureFile.statements + kern
+        doc.markClasses = featureFile.markClasses
+        featureFile = doc
+
+    if featureFile.statements:
+        Builder(ttFont, featureFile).build()
+
+
+def buildFont(font, featureFile=None, ttf=False, hooks=None):
+    """Build an OpenType font from the defcon font built by a parser, with
+    CFF outlines or, with ttf, TrueType ones, and return it as a TTFont. This
+    is meant for quick test builds, only the basic tables are built.
+
+    featureFile is the feaLib syntax tree the parsers build with fea_ast, if
+    it is None the text of the font features is parsed instead. The UFO
+    kerning of the font is added as a kern feature.
+
+    hooks is a list of PhaseHook objects notified of the compile phase, and
+    of the layout phase nested in it.
+    """
+    info = font.info
+    upem = _value(info.unitsPerEm, 1000)
+    ascender = _value(info.ascender, otRound(upem * 0.8))
+    descender = _value(info.descender, ascender - upem)
+
+    glyphs = dict((glyph.name, glyph) for glyph in font)
+    glyphOrder = [n for n in font.glyphOrder if n in glyphs]
+    ordered = set(glyphOrder)
+    glyphOrder += sorted(n for n in glyphs if n not in ordered)
+    if ".notdef" in glyphs:
+        glyphOrder.remove(".notdef")
+    else:
+        # An empty one, without adding it to the font.
+        glyphs[".notdef"] = Glyph()
+        glyphs[".notdef"].width = otRound(upem / 2)
+    glyphOrder.insert(0, ".notdef")
+
+    family = _value(info.familyName, "Untitled")
+    style = _value(info.styleName, "Regular")
+    psName = info.postscriptFontName or ("%s-%s" % (family, style)).replace(
+        " ", "")
+    fullName = info.postscriptFullName or "%s %s" % (family, style)
+    version = "%d.%03d" % (_value(info.versionMajor, 0),
+                           _value(info.versionMinor, 0))
+
+    with phase(hooks, "compile"):
+        fb = FontBuilder(upem, isTTF=ttf)
+        values = dict(fontRevision=float(version))
+        if info.openTypeHeadCreated:
+            created = calendar.timegm(time.strptime(info.openTypeHeadCreated,
+                                                    "%Y/%m/%d %H:%M:%S"))
+            values["created"] = values["modified"] = \
+                timestampSinceEpoch(created)
+        fb.updateHead(**values)
+        fb.setupGlyphOrder(glyphOrder)
+
+        cmap = {}
+        for name in glyphOrder:
+            for uv in glyphs[name].unicodes:
+                cmap.setdefault(uv, name)
+        fb.setupCharacterMap(cmap)
+
+        quadratic = _isQuadratic(glyphs.values())
+        if ttf:
+            fb.setupGlyf(_ttGlyphs(font, glyphs, glyphOrder, quadratic))
+            glyf = fb.font["glyf"]
+            lsbs = dict((n, getattr(glyf[n], "xMin", 0)) for n in glyphOrder)
+        else:
+            fontInfo = dict(FullName=fullName, FamilyName=family,
+                            Weight=_value(info.postscriptWeightName, style),
+                            version=version, Notice=_value(info.copyright, ""),
+                            ItalicAngle=_value(info.italicAngle, 0),
+                            isFixedPitch=int(
+                                bool(info.postscriptIsFixedPitch)))
+            private = {}
+            for key, attr in _PRIVATE_INFO:
+                value = getattr(info, attr)
+                if value not in (None, []):
+                    private[key] = value
+            if info.postscriptStemSnapH:
+                private["StdHW"] = info.postscriptStemSnapH[0]
+            if info.postscriptStemSnapV:
+                private["StdVW"] = info.postscriptStemSnapV[0]
+            fb.setupCFF(psName, fontInfo,
+                        _charStrings(font, glyphs, glyphOrder, quadratic),
+                        private)
+            charStrings = fb.font["CFF "].cff.topDictIndex[0].CharStrings
+            lsbs = {}
+            for name in glyphOrder:
+                bounds = charStrings[name].calcBounds(charStrings)
+                lsbs[name] = otRound(bounds[0]) if bounds else 0
+
+        fb.setupHorizontalMetrics(dict(
+            (n, (otRound(glyphs[n].width), lsbs[n])) for n in glyphOrder))
+        fb.setupHorizontalHeader(
+            ascent=_value(info.openTypeHheaAscender, ascender),
+            descent=_value(info.openTypeHheaDescender, descender),
+            lineGap=_value(info.openTypeHheaLineGap, 0))
+
+        fb.setupNameTable(dict(familyName=family, styleName=style,
+                               uniqueFontIdentifier="%s;%s" % (version,
+                                                               psName),
+                               fullName=fullName, psName=psName,
+                               version="Version " + version,
+                               copyright=_value(info.copyright, "")),
+                          mac=False)
+        for record in info.openTypeNameRecords or []:
+            fb.font["name"].setName(record["string"], record["nameID"],
+                                    record["platformID"], record["encodingID"],
+                                    record["languageID"])
+
+        selection = _bits(info.openTypeOS2Selection)
+        if not selection & (1 | 1 << 5):
+            # Neither italic nor bold.
+            selection |= 1 << 6
+        os2 = dict(version=4, fsType=_bits(info.openTypeOS2Type),
+                   fsSelection=selection,
+                   sTypoAscender=_value(info.openTypeOS2TypoAscender,
+                                        ascender),
+                   sTypoDescender=_value(info.openTypeOS2TypoDescender,
+                                         descender),
+                   usWinAscent=_value(info.openTypeOS2WinAscent, ascender),
+                   usWinDescent=_value(info.openTypeOS2WinDescent,
+                                       abs(descender)))
+        for field, attr in _OS2_INFO:
+            value = getattr(info, attr)
+            if value is not None:
+                os2[field] = otRound(value)
+        if info.openTypeOS2VendorID:
+            os2["achVendID"] = info.openTypeOS2VendorID
+        if info.openTypeOS2FamilyClass:
+            familyClass, subclass = info.openTypeOS2FamilyClass
+            os2["sFamilyClass"] = familyClass << 8 | subclass
+        fb.setupOS2(**os2)
+        if info.openTypeOS2Panose:
+            panose = fb.font["OS/2"].panose
+            for field, value in zip(_PANOSE_FIELDS, info.openTypeOS2Panose):
+                setattr(panose, field, value)
+
+        fb.setupPost(keepGlyphNames=ttf,
+                     italicAngle=_value(info.italicAngle, 0),
+                     underlinePosition=otRound(
+                         _value(info.postscriptUnderlinePosition, 0)),
+                     underlineThickness=otRound(
+                         _value(info.postscriptUnderlineThickness, 0)),
+                     isFixedPitch=int(bool(info.postscriptIsFixedPitch)))
+        fb.setupMaxp()
+
+        with phase(hooks, "layout"):
+            _buildFeatures(fb.font, font, featureFile)
+
+    return fb.font
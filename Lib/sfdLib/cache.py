@@ -0,0 +1,102 @@
+#
+# encoding: utf-8
+
+from __future__ import print_function, division
+from fontTools.misc.py23 import *
+
+import glob
+import hashlib
+import os
+import pickle
+import tempfile
+
+from . import __version__
+from .parser import PARSER_REVISION
+from .utils import inputFiles
+
+# The version of the structure of the data the parser stores, part of the
+# keys along with PARSER_REVISION. Bump it whenever the structure changes.
+CACHE_FORMAT = 1
+
+
+class ParseCache(object):
+    """An on-disk cache of parsed SFD fonts.
+
+    Entries are keyed by the contents of the font, the parser options, the
+    sfdLib version, PARSER_REVISION and CACHE_FORMAT. When the cache grows
+    beyond maxSize bytes, the least recently used entries are removed.
+    """
+
+    def __init__(self, path, maxSize=512 * 1024 * 1024):
+        self._path = path
+        self._maxSize = maxSize
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def key(self, sfdPath, **options):
+        digest = hashlib.sha256()
+        digest.update(tobytes("sfdLib %s %d %d\n" % (
+            __version__, PARSER_REVISION, CACHE_FORMAT)))
+        for name in sorted(options):
+            digest.update(tobytes("%s=%r\n" % (name, options[name])))
+        for filename in inputFiles(sfdPath):
+            size = os.path.getsize(filename)
+            name = os.path.basename(filename)
+            digest.update(tobytes("%s %d\n" % (name, size), "utf-8"))
+            with open(filename, "rb") as fp:
+                for chunk in iter(lambda: fp.read(1 << 20), b""):
+                    digest.update(chunk)
+        return digest.hexdigest()
+
+    def _filename(self, key):
+        return os.path.join(self._path, key + ".pickle")
+
+    def get(self, key):
+        """Return the data stored for key, or None."""
+        filename = self._filename(key)
+        if not os.path.isfile(filename):
+            return None
+        try:
+            with open(filename, "rb") as fp:
+                data = pickle.load(fp)
+        except Exception:
+            # A broken or stale entry, parse the font again.
+            return None
+
+        # Mark the entry as recently used.
+        os.utime(filename, None)
+        return data
+
+    def put(self, key, data):
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self._path)
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                pickle.dump(data, fp, pickle.HIGHEST_PROTOCOL)
+            try:
+                os.replace(tmp, self._filename(key))
+            except AttributeError: # Python 2
+                os.rename(tmp, self._filename(key))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for filename in glob.glob(os.path.join(self._path, "*.pickle")):
+            try:
+                st = os.stat(filename)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, filename))
+
+        size = sum(e[1] for e in entries)
+        for _, entrySize, filename in sorted(entries):
+            if size <= self._maxSize:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            size -= entrySize
@@ -0,0 +1,96 @@
+#
+# encoding: utf-8
+
+from __future__ import print_function, division
+from fontTools.misc.py23 import *
+
+import json
+import os
+
+from defcon import Font
+
+from . import __version__
+from .instrument import phase
+from .parser import SFDParser, PARSER_REVISION
+
+
+def manifestPath(ufoPath):
+    """Return the path of the manifest kept next to an incrementally converted
+    UFO."""
+    return os.path.normpath(ufoPath) + ".manifest.json"
+
+
+def _readManifest(path):
+    try:
+        with open(path) as fp:
+            return json.load(fp)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def _writeManifest(path, manifest):
+    with open(path, "w") as fp:
+        json.dump(manifest, fp)
+
+
+def updateUFO(sfdPath, ufoPath, ignore_uvs=False, ufo_anchors=False,
+              hooks=None):
+    """Convert sfdPath to ufoPath, re-converting only the glyphs that changed
+    since the last time, as recorded in a manifest of per-glyph hashes next
+    to the UFO. The font-wide data are always rebuilt, but only the changed
+    glyphs are parsed and written.
+
+    Without a manifest, or if the glyph order, the layers or the options
+    changed, the whole font is converted.
+
+    hooks is a list of PhaseHook objects notified of the conversion phases.
+
+    Returns the names of the re-converted glyphs.
+    """
+    path = manifestPath(ufoPath)
+    manifest = None
+    if os.path.isdir(ufoPath):
+        manifest = _readManifest(path)
+
+    # Index the font to find out what changed, this is cheap compared to
+    # parsing it.
+    probe = Font()
+    parser = SFDParser(sfdPath, probe, ignore_uvs, ufo_anchors)
+    parser.index()
+    hashes = parser.glyphHashes()
+
+    signature = dict(version=__version__, revision=PARSER_REVISION,
+                     options=[ignore_uvs, ufo_anchors],
+                     layers=list(probe.layers.layerOrder),
+                     glyphOrder=list(hashes))
+
+    if manifest is None or manifest.get("signature") != signature:
+        font = Font()
+        parser = SFDParser(sfdPath, font, ignore_uvs, ufo_anchors,
+                           hooks=hooks, keep_glyph_data=True)
+        parser.parse()
+        changed = list(hashes)
+    else:
+        glyphs = manifest["glyphs"]
+        reuse = {}
+        changed = []
+        for name, digest in hashes.items():
+            if glyphs[name]["hash"] == digest:
+                reuse[name] = glyphs[name]["data"]
+            else:
+                changed.append(name)
+
+        font = Font(ufoPath)
+        parser = SFDParser(sfdPath, font, ignore_uvs, ufo_anchors,
+                           hooks=hooks, keep_glyph_data=True)
+        parser.parse(reuse)
+
+    with phase(hooks, "save"):
+        font.save(ufoPath)
+
+    data = parser.glyphData()
+    glyphs = dict((name, dict(hash=hashes[name], data=data[name]))
+                  for name in hashes)
+    _writeManifest(path, dict(signature=signature, glyphs=glyphs))
+
+    return changed
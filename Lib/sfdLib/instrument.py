@@ -0,0 +1,238 @@
+#
+# encoding: utf-8
+
+from __future__ import print_function, division
+
+import gc
+import sys
+import time
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    _cpuTime = time.process_time
+except AttributeError: # Python 2
+    _cpuTime = time.clock
+
+try:
+    import tracemalloc
+except ImportError: # Python 2
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+# The phases of a conversion, in order. Both parsers report them under these
+# names, but the native parser does the work of the references,
+# offsetMetrics, gsub, gpos and gdef phases as part of its other phases. In
+# our parser, chars is nested in header and gsub, gpos and gdef in features,
+# in the native parser kernClasses is nested in kerns. Only building OpenType
+# fonts has the compile phase, with layout nested in it.
+PHASES = ("header", "chars", "references", "kerns", "kernClasses",
+          "offsetMetrics", "features", "gsub", "gpos", "gdef", "compile",
+          "layout", "save")
+
+
+@contextmanager
+def phase(hooks, name):
+    """Run the enclosed block as the named phase, notifying the hooks.
+
+    An exception raised in the phase gets the name of the innermost phase
+    as its phase attribute.
+    """
+    hooks = hooks or ()
+    for hook in hooks:
+        hook.startPhase(name)
+    try:
+        yield
+    except Exception as e:
+        if getattr(e, "phase", None) is None:
+            e.phase = name
+        raise
+    finally:
+        for hook in reversed(hooks):
+            hook.endPhase(name)
+
+
+def canLimitMemory():
+    """Return whether limitMemory() is supported on this platform."""
+    return resource is not None and hasattr(resource, "RLIMIT_AS")
+
+
+# The address space in use when limitMemory() was first called, so that
+# converting several fonts in one process does not move the limit.
+_baseAddressSpace = None
+
+
+def _addressSpace():
+    """Return the address space this process uses in bytes, or 0 when it can
+    not be determined."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[0])
+    except (IOError, OSError, ValueError, IndexError):
+        return 0
+    return pages * resource.getpagesize()
+
+
+def limitMemory(limit):
+    """Limit the address space of this process to limit bytes more than it
+    used when first called, i.e. by the interpreter and the modules imported
+    so far, so that running out of memory raises MemoryError instead of
+    swapping."""
+    global _baseAddressSpace
+    if not canLimitMemory():
+        raise RuntimeError("Memory limits are not supported on this platform")
+    if _baseAddressSpace is None:
+        _baseAddressSpace = _addressSpace()
+    limit += _baseAddressSpace
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _maxRSS():
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        # Kilobytes everywhere else.
+        rss *= 1024
+    return rss
+
+
+class PhaseHook(object):
+    """Base class of the hooks passed to the parsers, to be notified of the
+    start and end of each conversion phase. Phases can be nested, and the
+    same phase can run more than once."""
+
+    def startPhase(self, name):
+        pass
+
+    def endPhase(self, name):
+        pass
+
+
+class PhaseTimer(PhaseHook):
+    """Records the wall time, CPU time and change in the number of objects
+    tracked by the garbage collector of each phase.
+
+    The times of a phase exclude those of the phases nested in it.
+    """
+
+    def __init__(self, countObjects=True):
+        self._countObjects = countObjects
+        self._stack = []
+        self._start = None
+        self.phases = OrderedDict()
+
+    def _now(self):
+        objects = len(gc.get_objects()) if self._countObjects else 0
+        return time.time(), _cpuTime(), objects
+
+    def _stop(self, name, now):
+        record = self.phases.setdefault(name, [0, 0, 0])
+        for i, value in enumerate(now):
+            record[i] += value - self._start[i]
+
+    def startPhase(self, name):
+        now = self._now()
+        if self._stack:
+            self._stop(self._stack[-1], now)
+        self._stack.append(name)
+        self._start = now
+
+    def endPhase(self, name):
+        now = self._now()
+        self._stop(name, now)
+        self._stack.pop()
+        self._start = now
+
+    def report(self, out=sys.stderr):
+        """Print a table of the recorded phases."""
+        print("%-14s %9s %9s %10s" % ("phase", "wall", "cpu", "objects"),
+              file=out)
+        for name, (wall, cpu, objects) in self.phases.items():
+            print("%-14s %9.3f %9.3f %+10d" % (name, wall, cpu, objects),
+                  file=out)
+        wall, cpu, objects = [sum(r[i] for r in self.phases.values())
+                              for i in range(3)]
+        print("%-14s %9.3f %9.3f %+10d" % ("total", wall, cpu, objects),
+              file=out)
+
+
+class PhaseMemory(PhaseHook):
+    """Records, with tracemalloc, the peak memory allocated during each phase
+    and the memory still allocated at its end, relative to its start, and the
+    maximum resident set size of the process at its end.
+
+    Unlike PhaseTimer, the figures of a phase include those of the phases
+    nested in it. Tracing allocations slows the conversion down noticeably,
+    tracing starts with the first phase and lasts until stop() is called.
+    """
+
+    def __init__(self):
+        self._stack = []
+        self._tracing = False
+        self.phases = OrderedDict()
+
+    def _resetPeak(self):
+        # Without reset_peak() (before Python 3.9), the peak of a phase is
+        # the peak since tracing started.
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+    def _traced(self):
+        if not self._tracing:
+            return 0, 0
+        return tracemalloc.get_traced_memory()
+
+    def startPhase(self, name):
+        if tracemalloc is not None and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+        current, peak = self._traced()
+        if self._stack:
+            parent = self._stack[-1]
+            parent[1] = max(parent[1], peak)
+        if self._tracing:
+            self._resetPeak()
+        # Allocated memory at the start, and the peak so far.
+        self._stack.append([current, current])
+        self.phases.setdefault(name, [0, 0, 0])
+
+    def endPhase(self, name):
+        start, peak = self._stack.pop()
+        current, phasePeak = self._traced()
+        peak = max(peak, phasePeak)
+        if self._stack:
+            parent = self._stack[-1]
+            parent[1] = max(parent[1], peak)
+        if self._tracing:
+            self._resetPeak()
+
+        record = self.phases[name]
+        record[0] = max(record[0], peak - start)
+        record[1] += current - start
+        record[2] = max(record[2], _maxRSS())
+
+    def stop(self):
+        """Stop tracing allocations, if we started it."""
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def report(self, out=sys.stderr):
+        """Print a table of the recorded phases, in megabytes."""
+        mb = 1024. * 1024.
+        print("%-14s %10s %10s %10s" % ("phase", "peak", "retained",
+                                        "max rss"), file=out)
+        for name, (peak, retained, rss) in self.phases.items():
+            print("%-14s %10.1f %+10.1f %10.1f" % (name, peak / mb,
+                                                   retained / mb, rss / mb),
+                  file=out)
@@ -8,33 +8,51 @@ import fontforge
 import math
 
 from .utils import parseAltuni, parseAnchorPoint, parseColor, parseVersion, \
-                   getFontBounds, processKernClasses
+                   getFontBounds, processKernClasses, notificationsDisabled
 from .utils import GLYPHCLASS_KEY, DECOMPOSEREMOVEOVERLAP_KEY
+from .instrument import phase
 
 
 class SFDParser():
     """Parses an SFD file or SFDIR directory, using FontForge’s native python
     extension.
+
+    hooks is a list of PhaseHook objects notified of the conversion phases.
+
+    With fea_ast, the features are parsed to a fontTools.feaLib.ast.FeatureFile
+    available as the featureFile attribute after parse(), instead of being
+    set as the text of the font features. FontForge only generates feature
+    files, so unlike our parser this does not save parsing them.
     """
 
-    def __init__(self, path, font, ignore_uvs=False, ufo_anchors=False):
+    def __init__(self, path, font, ignore_uvs=False, ufo_anchors=False,
+                 hooks=None, fea_ast=False):
         self._path = path
         self._font = font
         self._ignore_uvs = ignore_uvs
         self._use_ufo_anchors = ufo_anchors
+        self._hooks = hooks or []
+        self._fea_ast = fea_ast
+        self.featureFile = None
 
         self._sfd = None
         self._layerMap = {}
         self._private = {}
 
     def parse(self):
-        self._sfd = fontforge.open(self._path)
-
-        self._buildLayers()
-        self._buildGlyphs()
-        self._buildKerning()
-        self._buildFeatures()
-        self._buildInfo()
+        hooks = self._hooks
+        with phase(hooks, "header"):
+            self._sfd = fontforge.open(self._path)
+            self._buildLayers()
+        with phase(hooks, "chars"):
+            self._buildGlyphs()
+        with phase(hooks, "kerns"):
+            self._buildKerning()
+        with phase(hooks, "features"):
+            self._buildFeatures()
+        # The font info includes the offset metrics, that need the glyphs.
+        with phase(hooks, "header"):
+            self._buildInfo()
 
     def __del__(self):
         if self._sfd is not None:
@@ -245,47 +263,56 @@ class SFDParser():
                 self._layerMap[name] = self._font.newLayer(name)
 
     def _buildGlyphs(self):
-        for name in self._sfd:
-            sfdGlyph = self._sfd[name]
-            for sfdLayerName in sfdGlyph.layers:
-                sfdLayer = sfdGlyph.layers[sfdLayerName]
-                sfdLayerRefs = sfdGlyph.layerrefs[sfdLayerName]
-                layer = self._layerMap[sfdLayerName]
-                if not sfdLayer and not sfdLayerRefs and layer != self._font.layers.defaultLayer:
-                    continue
-                glyph = layer.newGlyph(name)
-                pen = glyph.getPen()
-                glyph.width = sfdGlyph.width
-                # Hmm, FontForge always reports a vwidth even if the user
-                # didn’t set any! The test against UPEM is an attempt to catch
-                # this.
-                if sfdGlyph.vwidth != self._sfd.em:
-                    glyph.height = sfdGlyph.vwidth
-                sfdLayer.draw(pen)
-                for ref in sfdLayerRefs:
-                    pen.addComponent(ref[0], ref[1])
-                if sfdGlyph.color >= 0:
-                    glyph.markColor = parseColor(sfdGlyph.color)
-                if layer == self._font.layers.defaultLayer:
-                    if sfdGlyph.glyphclass != "automatic":
-                        glyph.lib[GLYPHCLASS_KEY] = sfdGlyph.glyphclass
-                    if sfdGlyph.unlinkRmOvrlpSave:
-                        glyph.lib[DECOMPOSEREMOVEOVERLAP_KEY] = True
-
-            glyph = self._font[name]
-            unicodes = []
-            if sfdGlyph.unicode > 0:
-                unicodes.append(sfdGlyph.unicode)
-            if sfdGlyph.altuni:
-                unicodes += parseAltuni(name, sfdGlyph.altuni, self._ignore_uvs)
-            glyph.unicodes = unicodes
-
-            if self._use_ufo_anchors:
-                for anchor in sfdGlyph.anchorPoints:
-                    glyph.appendAnchor(parseAnchorPoint(anchor))
-                # Now remove the anchors so that we don’t export them to the
-                # feature file.
-                sfdGlyph.anchorPoints = []
+        glyphOrder = []
+        with notificationsDisabled(self._font):
+            for name in self._sfd:
+                glyphOrder.append(name)
+                self._buildGlyph(name)
+
+        # The glyph order is not updated while notifications are disabled.
+        self._font.glyphOrder = glyphOrder
+
+    def _buildGlyph(self, name):
+        sfdGlyph = self._sfd[name]
+        for sfdLayerName in sfdGlyph.layers:
+            sfdLayer = sfdGlyph.layers[sfdLayerName]
+            sfdLayerRefs = sfdGlyph.layerrefs[sfdLayerName]
+            layer = self._layerMap[sfdLayerName]
+            if not sfdLayer and not sfdLayerRefs and layer != self._font.layers.defaultLayer:
+                continue
+            glyph = layer.newGlyph(name)
+            pen = glyph.getPen()
+            glyph.width = sfdGlyph.width
+            # Hmm, FontForge always reports a vwidth even if the user
+            # didn’t set any! The test against UPEM is an attempt to catch
+            # this.
+            if sfdGlyph.vwidth != self._sfd.em:
+                glyph.height = sfdGlyph.vwidth
+            sfdLayer.draw(pen)
+            for ref in sfdLayerRefs:
+                pen.addComponent(ref[0], ref[1])
+            if sfdGlyph.color >= 0:
+                glyph.markColor = parseColor(sfdGlyph.color)
+            if layer == self._font.layers.defaultLayer:
+                if sfdGlyph.glyphclass != "automatic":
+                    glyph.lib[GLYPHCLASS_KEY] = sfdGlyph.glyphclass
+                if sfdGlyph.unlinkRmOvrlpSave:
+                    glyph.lib[DECOMPOSEREMOVEOVERLAP_KEY] = True
+
+        glyph = self._font[name]
+        unicodes = []
+        if sfdGlyph.unicode > 0:
+            unicodes.append(sfdGlyph.unicode)
+        if sfdGlyph.altuni:
+            unicodes += parseAltuni(name, sfdGlyph.altuni, self._ignore_uvs)
+        glyph.unicodes = unicodes
+
+        if self._use_ufo_anchors:
+            for anchor in sfdGlyph.anchorPoints:
+                glyph.appendAnchor(parseAnchorPoint(anchor))
+            # Now remove the anchors so that we don’t export them to the
+            # feature file.
+            sfdGlyph.anchorPoints = []
 
     def _buildKerning(self):
         sfd = self._sfd
@@ -325,7 +352,8 @@ class SFDParser():
                             # to the feature file.
                             sfdGlyph.removePosSub(subtable)
 
-        processKernClasses(self._font, subtables)
+        with phase(self._hooks, "kernClasses"):
+            processKernClasses(self._font, subtables)
 
     def _buildFeatures(self):
         if hasattr(self._sfd, "generateFeatureString"):
@@ -336,4 +364,10 @@ class SFDParser():
                 self._sfd.generateFeatureFile(feafile.name)
                 feafile.flush()
                 fea = feafile.read()
-        self._font.features.text = tounicode(fea)
+        fea = tounicode(fea)
+        if self._fea_ast:
+            from fontTools.feaLib.parser import Parser
+            parser = Parser(UnicodeIO(fea), glyphNames=self._font.keys())
+            self.featureFile = parser.parse()
+        else:
+            self._font.features.text = fea
@@ -5,22 +5,38 @@ from __future__ import print_function, division
 from fontTools.misc.py23 import *
 
 import codecs
+import hashlib
 import math
+import mmap
 import os
 import re
 
-from collections import OrderedDict
+from array import array
+from collections import OrderedDict, namedtuple
 from datetime import datetime
+from fontTools.misc.arrayTools import unionRect
+
+try:
+    from collections.abc import Mapping
+except ImportError: # Python 2
+    from collections import Mapping
 
 from .utils import parseAltuni, parseAnchorPoint, parseColor, parseVersion, \
-                   getFontBounds, processKernClasses, SFDReadUTF7
+                   getFontBounds, processKernClasses, notificationsDisabled, \
+                   gcPaused, SFDReadUTF7
 from .utils import GLYPHCLASS_KEY, DECOMPOSEREMOVEOVERLAP_KEY
+from .instrument import phase
+
+# The revision of the fonts the parser produces, part of the parse cache keys
+# and of the signature of incrementally converted fonts. Bump it whenever a
+# parser change alters the output, so that results of the older parser are
+# not reused.
+PARSER_REVISION = 1
 
 
 QUOTED_RE = re.compile('(".*?")')
 NUMBER_RE = re.compile("(-?\d*\.*\d+)")
 LAYER_RE = re.compile("(.)\s+(.)\s+" + QUOTED_RE.pattern + "\s+(.?)")
-GLYPH_SEGMENT_RE = re.compile('(\s[lmc]\s)')
 KERNS_RE = re.compile(
     NUMBER_RE.pattern +
     "\s+" +
@@ -58,6 +74,14 @@ LANGSYS_RE = re.compile(
     "\s+"
 )
 SUBPOS_RE = re.compile(QUOTED_RE.pattern + "\s+(.*.)")
+LOOKUPNAME_RE = re.compile("[^A-Za-z0-9._]+")
+
+
+def _flattenFeatures(features):
+    """Return the (feature, script, language) tuples of the feature list of a
+    lookup, in order."""
+    return [(feature[0], script, language) for feature in features
+            for script, languages in feature[1:] for language in languages]
 
 
 def _splitList(data, n):
@@ -65,37 +89,339 @@ def _splitList(data, n):
     return [data[i:i + n] for i in range(0, len(data), n)]
 
 
+# NumPy, imported by _importNumpy() when first needed, or False when it is
+# not available.
+_numpy = None
+
+
+def _importNumpy():
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy as _numpy
+        except ImportError:
+            _numpy = False
+    return _numpy
+
+
+def preloadModules(fea_ast=False):
+    """Import the optional modules the parser otherwise imports when first
+    needed, NumPy and with fea_ast feaLib. Some reserve a lot of address
+    space when imported, so this has to be done before limiting the memory
+    of the process."""
+    _importNumpy()
+    if fea_ast:
+        from fontTools.feaLib import ast
+
+
+def _decodeCoordinates(data, count):
+    """Decode a string of count space separated coordinates to an array of
+    floats, using NumPy when it is available."""
+    if _importNumpy():
+        # NumPy stops at the first malformed number instead of failing.
+        values = _numpy.fromstring(data, sep=" ")
+        coords = array("d")
+        # Copy the values straight from the NumPy buffer.
+        try:
+            coords.frombytes(values.view(_numpy.uint8))
+        except AttributeError: # Python 2
+            coords.fromstring(values.tobytes())
+    else:
+        coords = array("d", [float(c) for c in data.split()])
+    if len(coords) != count:
+        raise ValueError("Malformed coordinates, expected %d numbers but "
+                         "got %d" % (count, len(coords)))
+    return coords
+
+
+# The number of coordinates of each SplineSet segment type.
+_SEGMENT_COORDS = {"m": 2, "l": 2, "c": 6}
+
+# Point types of _Contour, and the UFO segment types they map to.
+_MOVE, _LINE, _CURVE, _QCURVE, _OFFCURVE = range(5)
+_SEGMENT_TYPES = ("move", "line", "curve", "qcurve", None)
+
+# Point flags of _Contour.
+_SMOOTH = 0x1
+_INTERPOLATE = 0x2
+_FORCE_OPEN = 0x4
+
+
+def _parsePointFlags(data):
+    flag = data.split(",")[0]
+    flag = flag.split("x")[0]
+    flag = int(flag)
+
+    flags = 0
+    if (flag & 0x3) != 1:
+        flags |= _SMOOTH
+    if flag & 0x80: # SFD_PTFLAG_INTERPOLATE
+        flags |= _INTERPOLATE
+    if flag & 0x400: # SFD_PTFLAG_FORCE_OPEN_PATH
+        flags |= _FORCE_OPEN
+    return flags
+
+
+class _Contour(object):
+    """A contour, with the point coordinates, types and flags kept in flat
+    arrays instead of a tuple per point."""
+
+    __slots__ = ("coords", "types", "flags", "name")
+
+    def __init__(self, name=None):
+        self.coords = array("d")
+        self.types = array("B")
+        self.flags = array("B")
+        self.name = name
+
+    def __len__(self):
+        return len(self.types)
+
+    def __iter__(self):
+        coords = self.coords
+        flags = self.flags
+        for i, pointType in enumerate(self.types):
+            yield coords[2 * i], coords[2 * i + 1], pointType, flags[i]
+
+    # Python 2 can’t pickle __slots__ objects without these.
+    def __getstate__(self):
+        return self.coords, self.types, self.flags, self.name
+
+    def __setstate__(self, state):
+        self.coords, self.types, self.flags, self.name = state
+
+    def point(self, index):
+        index %= len(self.types)
+        return self.coords[2 * index], self.coords[2 * index + 1]
+
+    def addPoint(self, x, y, pointType, flags=0):
+        self.coords.append(x)
+        self.coords.append(y)
+        self.types.append(pointType)
+        self.flags.append(flags)
+
+    def setPoint(self, index, x, y, pointType, flags=0):
+        index %= len(self.types)
+        self.coords[2 * index] = x
+        self.coords[2 * index + 1] = y
+        self.types[index] = pointType
+        self.flags[index] = flags
+
+    def pop(self):
+        x, y = self.point(-1)
+        point = (x, y, self.types.pop(), self.flags.pop())
+        del self.coords[-2:]
+        return point
+
+
+def _lines(stream):
+    """Iterate over the non-empty lines of stream, stripped."""
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield line
+
+
+class _SFDReader(object):
+    """Reads an SFD file through a memory map. Lines and sections are located
+    on the raw bytes and only decoded when consumed."""
+
+    def __init__(self, path):
+        if not os.path.getsize(path):
+            raise Exception("Not an SFD file.")
+        with open(path, "rb") as fd:
+            self._data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._data.close()
+
+    def line(self, offset):
+        """Decode the line starting at offset."""
+        end = self._data.find(b"\n", offset)
+        if end < 0:
+            end = len(self._data)
+        return self.decode(offset, end - offset).strip()
+
+    def decode(self, offset, length):
+        return self._data[offset:offset + length].decode("utf-8")
+
+    def find(self, sub, start, end):
+        return self._data.find(sub, start, end)
+
+    def sections(self, start, end, stop):
+        """Iterate over the (offset, length) of the sections beginning with a
+        line starting with start and ending with a line starting with end,
+        until a line starting with stop. The reader is left after the stop
+        line."""
+        data = self._data
+        pos = max(data.tell() - 1, 0)
+        limit = data.find(b"\n" + stop, pos)
+        if limit < 0:
+            limit = len(data)
+
+        start = b"\n" + start
+        end = b"\n" + end
+        while True:
+            offset = data.find(start, pos, limit)
+            if offset < 0:
+                break
+            offset += 1
+            pos = data.find(end, offset, limit)
+            if pos < 0:
+                pos = limit
+            else:
+                pos = data.find(b"\n", pos + 1, limit)
+                if pos < 0:
+                    pos = limit
+            yield offset, pos + 1 - offset
+
+        data.seek(min(limit + 1, len(data)))
+        data.readline()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            line = self._data.readline()
+            if not line:
+                raise StopIteration
+            line = line.strip()
+            if line:
+                return line.decode("utf-8")
+
+    next = __next__ # Python 2
+
+
+def _glyphFiles(path):
+    """Return the glyph files in an SFDIR directory."""
+    import glob
+    return glob.glob(os.path.join(path, "*.glyph"))
+
+
+def _readGlyphFile(filename):
+    with open(filename, "rb") as fp:
+        return fp.read().decode("utf-8")
+
+
+def _decodeEscapes(value):
+    return codecs.escape_decode(value)[0].decode("utf-8")
+
+
+def _parseTimestamp(value):
+    v = datetime.utcfromtimestamp(int(value))
+    return v.strftime("%Y/%m/%d %H:%M:%S")
+
+
+def _parseBits(value, n):
+    return [bit for bit in range(n) if value & (1 << bit)]
+
+
+GlyphRecord = namedtuple("GlyphRecord",
+    ["name", "encoding", "order", "path", "offset", "length"])
+GlyphRecord.__doc__ = """Location of a StartChar…EndChar block in an SFD file
+or SFDIR glyph file."""
+
+
 def _dumpAnchor(anchor):
     if not anchor:
         return "<anchor NULL>"
     return "<anchor %g %g>" % (anchor[0], anchor[1])
 
 
+def _feaAnchor(anchor):
+    """Return the feaLib AST of an anchor, the same as _dumpAnchor()."""
+    from fontTools.feaLib import ast
+    if not anchor:
+        return None
+    x, y = [int(v) if v == int(v) else v for v in anchor[:2]]
+    return ast.Anchor(x, y)
+
+
+def _feaSubst(old, new):
+    """Return the feaLib AST of the substitution of the old glyphs by the new
+    ones, of the kind feaLib would parse the rule as."""
+    from fontTools.feaLib import ast
+    if len(old) > 1:
+        return ast.LigatureSubstStatement([], [ast.GlyphName(g) for g in old],
+                                          [], new[0], False)
+    if len(new) > 1:
+        return ast.MultipleSubstStatement([], ast.GlyphName(old[0]), [],
+                                          [ast.GlyphName(g) for g in new])
+    return ast.SingleSubstStatement([ast.GlyphName(old[0])],
+                                    [ast.GlyphName(new[0])], [], [], False)
+
+
 class SFDParser():
-    """Parses an SFD file or SFDIR directory."""
+    """Parses an SFD file or SFDIR directory.
 
-    def __init__(self, path, font, ignore_uvs=False, ufo_anchors=False):
+    hooks is a list of PhaseHook objects notified of the conversion phases.
+
+    With fea_ast, the features are built as a fontTools.feaLib.ast.FeatureFile
+    available as the featureFile attribute after parse(), instead of as the
+    text of the font features. Its asFea() method renders it as text.
+
+    With keep_glyph_data, the data of each glyph that goes into the font-wide
+    data are kept for glyphData(), for updating the font later.
+    """
+
+    def __init__(self, path, font, ignore_uvs=False, ufo_anchors=False,
+                 jobs=1, cache=None, hooks=None, fea_ast=False,
+                 keep_glyph_data=False):
         self._path = path
         self._font = font
         self._ignore_uvs = ignore_uvs
         self._use_ufo_anchors = ufo_anchors
+        self._jobs = jobs
+        self._cache = cache
+        self._hooks = hooks or []
+        self._fea_ast = fea_ast
+        self._keepGlyphData = keep_glyph_data
+        self._initState()
+
+    def _initState(self):
+        """Initialize the state filled by parsing the font."""
+        self._chars = None
+        self.featureFile = None
 
         self._layers = []
         self._layerType = []
 
+        self._glyphNames = {}
+        self._glyphData = OrderedDict()
+        self._glyphClasses = {}
         self._glyphRefs = OrderedDict()
         self._glyphAnchors = OrderedDict()
+        self._anchorClassGlyphs = {}
+        self._glyphPositions = None
         self._glyphKerns = OrderedDict()
         self._glyphPosSub = OrderedDict()
+        self._subtableRules = OrderedDict()
 
         self._anchorClasses = OrderedDict()
         self._kernClasses = OrderedDict()
         self._gsubLookups = OrderedDict()
         self._gposLookups = OrderedDict()
         self._lookupInfo = OrderedDict()
+        self._lookupLangSystems = {}
         self._ligatureCarets = OrderedDict()
 
         self._sanitizedLookupNames = {}
+        self._usedLookupNames = set()
+        self._lookupNameCounters = {}
+
+        self._offsetMetrics = []
+
+        self._lazy = False
+        self._glyphIndex = OrderedDict()
+        self._glyphRecords = []
+        self._loadedChars = {}
 
     def _parsePrivateDict(self, data):
         info = self._font.info
@@ -138,14 +464,19 @@ class SFDParser():
             elif key == "StdVW":
                 StdVW = value[0]
 
+        # The stem snaps may be missing, in which case defcon may give None.
         if StdHW:
-            if StdHW in info.postscriptStemSnapH:
-                info.postscriptStemSnapH.pop(info.postscriptStemSnapH.index(StdHW))
-            info.postscriptStemSnapH.insert(0, StdHW)
+            stemSnapH = info.postscriptStemSnapH or []
+            if StdHW in stemSnapH:
+                stemSnapH.pop(stemSnapH.index(StdHW))
+            stemSnapH.insert(0, StdHW)
+            info.postscriptStemSnapH = stemSnapH
         if StdVW:
-            if StdVW in info.postscriptStemSnapV:
-                info.postscriptStemSnapV.pop(info.postscriptStemSnapV.index(StdVW))
-            info.postscriptStemSnapV.insert(0, StdVW)
+            stemSnapV = info.postscriptStemSnapV or []
+            if StdVW in stemSnapV:
+                stemSnapV.pop(stemSnapV.index(StdVW))
+            stemSnapV.insert(0, StdVW)
+            info.postscriptStemSnapV = stemSnapV
 
     def _parseGaspTable(self, data):
         info = self._font.info
@@ -215,179 +546,194 @@ class SFDParser():
                         dict(nameID=nameId, languageID=langId, string=name,
                              platformID=3, encodingID=1))
 
-    def _getSection(self, data, i, end, value=None):
+    def _getSection(self, stream, end, value=None):
         section = []
         if value is not None:
             section.append(value)
 
-        while not data[i].startswith(end):
-            section.append(data[i])
-            i += 1
+        for line in stream:
+            if line.startswith(end):
+                break
+            section.append(line)
 
-        return section, i + 1
+        return section
 
     def _parseSplineSet(self, data):
         contours = []
 
-        i = 0
-        while i < len(data):
-            line = data[i]
-            i += 1
+        segments = []
+        coords = []
+        count = 0
 
+        data = iter(data)
+        for line in data:
             if line == "Spiro":
-                spiro, i = self._getSection(data, i, "EndSpiro")
-                i += 1
+                spiro = self._getSection(data, "EndSpiro")
+                next(data, None)
             elif line.startswith("Named"):
                 name = SFDReadUTF7(line.split(": ")[1])
-                contours[-1].append(name)
+                segments.append(name)
             else:
-                pts, segmentType, flags = [c.strip() for c in GLYPH_SEGMENT_RE.split(line)]
-                pts = [float(c) for c in pts.split(" ")]
-                pts = _splitList(pts, 2)
-                if   segmentType == "m":
-                    assert len(pts) == 1
-                    contours.append([(pts, segmentType, flags)])
-                elif segmentType == "l":
-                    assert len(pts) == 1
-                    contours[-1].append((pts, segmentType, flags))
-                elif segmentType == "c":
-                    assert len(pts) == 3
-                    contours[-1].append((pts, segmentType, flags))
+                pts, segmentType, flags = line.rsplit(None, 2)
+                n = _SEGMENT_COORDS.get(segmentType)
+                if n is None:
+                    continue
+                if len(pts.split()) != n:
+                    raise ValueError("Malformed SplineSet segment, expected "
+                                     "%d coordinates: %s" % (n, line))
+                coords.append(pts)
+                count += n
+                segments.append((segmentType, flags))
+
+        # Decode the coordinates of the whole block in one go, then hand them
+        # out to the segments.
+        coords = _decodeCoordinates(" ".join(coords), count) if coords \
+            else array("d")
+        i = 0
+        for segment in segments:
+            if not isinstance(segment, tuple):
+                contours[-1].name = segment
+                continue
+            segmentType, flags = segment
+            flags = _parsePointFlags(flags)
+            if   segmentType == "m":
+                contours.append(_Contour())
+                contours[-1].addPoint(coords[i], coords[i + 1], _MOVE, flags)
+                i += 2
+            elif segmentType == "l":
+                contours[-1].addPoint(coords[i], coords[i + 1], _LINE, flags)
+                i += 2
+            elif segmentType == "c":
+                contour = contours[-1]
+                contour.addPoint(coords[i], coords[i + 1], _OFFCURVE)
+                contour.addPoint(coords[i + 2], coords[i + 3], _OFFCURVE)
+                contour.addPoint(coords[i + 4], coords[i + 5], _CURVE, flags)
+                i += 6
+        assert i == len(coords)
 
         return contours
 
-    def _drawContours(self, glyph, contours, quadratic):
-        pen = glyph.getPointPen()
+    def _convertContours(self, contours, quadratic):
+        """Convert SFD contours to lists of UFO points."""
+        ufoContours = []
         for contour in contours:
             forceOpen = False
-            if not isinstance(contour[-1], (tuple, list)):
-                name = contour.pop()
+            coords = contour.coords
+            pointFlags = contour.flags
 
-            ufoContour = []
-            for pts, segmentType, flags in contour:
-                flag = flags.split(",")[0]
-                flag = flag.split("x")[0]
-                flag = int(flag)
+            ufoContour = _Contour()
+            for i, pointType in enumerate(contour.types):
+                if pointType == _OFFCURVE:
+                    # Handled with the on-curve point that ends the segment.
+                    continue
 
-                if flag & 0x400: # SFD_PTFLAG_FORCE_OPEN_PATH
+                x = coords[2 * i]
+                y = coords[2 * i + 1]
+                flags = pointFlags[i]
+                if flags & _FORCE_OPEN:
                     forceOpen = True
-                smooth = (flag & 0x3) != 1
-
-                if   segmentType == "m":
-                    ufoContour.append((pts[0], "move", smooth))
-                elif segmentType == "l":
-                    ufoContour.append((pts[0], "line", smooth))
+                smooth = flags & _SMOOTH
+
+                if pointType != _CURVE:
+                    ufoContour.addPoint(x, y, pointType, smooth)
+                elif quadratic:
+                    # XXX I don’t know what I’m doing
+                    assert contour.point(i - 2) == contour.point(i - 1)
+
+                    ufoContour.addPoint(*contour.point(i - 1),
+                                        pointType=_OFFCURVE)
+                    if flags & _INTERPOLATE:
+                        ufoContour.addPoint(x, y, _OFFCURVE)
+                    else:
+                        ufoContour.addPoint(x, y, _QCURVE, smooth)
                 else:
-                    curve = "curve"
-                    if quadratic:
-                        curve = "qcurve"
-
-                        # XXX I don’t know what I’m doing
-                        assert pts[0] == pts[1]
-                        pts.pop(0)
-
-                        if flag & 0x80: # SFD_PTFLAG_INTERPOLATE
-                            for pt in pts:
-                                ufoContour.append((pt, None, None))
-                            continue
-
-                    for pt in pts[:-1]:
-                        ufoContour.append((pt, None, None))
-                    ufoContour.append((pts[-1], curve, smooth))
+                    ufoContour.addPoint(*contour.point(i - 2),
+                                        pointType=_OFFCURVE)
+                    ufoContour.addPoint(*contour.point(i - 1),
+                                        pointType=_OFFCURVE)
+                    ufoContour.addPoint(x, y, _CURVE, smooth)
 
             # Closed path.
             if not forceOpen and (
                     len(ufoContour) > 1 and
-                    ufoContour[0][0] == ufoContour[-1][0]):
-                ufoContour[0] = ufoContour[-1]
-                ufoContour.pop()
+                    ufoContour.point(0) == ufoContour.point(-1)):
+                ufoContour.setPoint(0, *ufoContour.pop())
 
+            ufoContours.append(ufoContour)
+
+        return ufoContours
+
+    def _drawContours(self, glyph, contours):
+        pen = glyph.getPointPen()
+        for contour in contours:
+            coords = contour.coords
+            flags = contour.flags
             pen.beginPath()
-            for pt, segmentType, smooth in ufoContour:
-                pen.addPoint(pt, segmentType=segmentType, smooth=smooth)
+            for i, pointType in enumerate(contour.types):
+                pen.addPoint((coords[2 * i], coords[2 * i + 1]),
+                             segmentType=_SEGMENT_TYPES[pointType],
+                             smooth=bool(flags[i] & _SMOOTH))
             pen.endPath()
 
     def _parseGrid(self, data):
         info = self._font.info
 
-        data = [l.strip() for l in data]
         contours = self._parseSplineSet(data)
 
         for contour in contours:
-            name = None
-            p0 = None
-            if not isinstance(contour[-1], (tuple, list)):
-                name = contour.pop()
-
-            if len(contour) != 2:
+            if len(contour) != 2 or contour.types[1] != _LINE:
                 # UFO guidelines are simple straight lines, so I can handle any
                 # complex contours here.
                 continue
 
-            for pts, segmentType, flags in contour:
-                if   segmentType == "m":
-                    p0 = pts[0]
-                elif segmentType == "l":
-                    p1 = pts[0]
-
-                    x = None
-                    y = None
-                    angle = None
+            p0 = contour.point(0)
+            p1 = contour.point(1)
 
-                    if p0[0] == p1[0]:
-                        x = p0[0]
-                    elif p0[1] == p1[1]:
-                        y = p0[1]
-                    else:
-                        x = p0[0]
-                        y = p0[1]
-                        angle = math.atan2(p1[0] - p0[0], p1[1] - p0[1])
-                        angle = math.degrees(angle)
-                        if angle < 0:
-                            angle = 360 + angle
-                    info.appendGuideline(
-                        dict(x=x, y=y, name=name, angle=angle))
-                else:
-                    p0 = pts[0]
+            x = None
+            y = None
+            angle = None
 
-    def _parseImage(self, glyph, data):
+            if p0[0] == p1[0]:
+                x = p0[0]
+            elif p0[1] == p1[1]:
+                y = p0[1]
+            else:
+                x = p0[0]
+                y = p0[1]
+                angle = math.atan2(p1[0] - p0[0], p1[1] - p0[1])
+                angle = math.degrees(angle)
+                if angle < 0:
+                    angle = 360 + angle
+            info.appendGuideline(
+                dict(x=x, y=y, name=contour.name, angle=angle))
+
+    def _parseImage(self, layer, data):
         pass # XXX
 
-    def _parseKerns(self, glyph, data):
-        assert glyph.name not in self._glyphKerns
+    def _parseKerns(self, data):
         kerns = KERNS_RE.findall(data)
         assert kerns
-        self._glyphKerns[glyph.name] = []
-        for (gid, kern, subtable) in kerns:
-            gid = int(gid)
-            kern = int(kern)
-            self._glyphKerns[glyph.name].append((gid, kern))
+        return [(int(gid), int(kern)) for (gid, kern, subtable) in kerns]
 
-    def _parseKernClass(self, data, i, value):
+    def _parseKernClass(self, value, stream):
         m = KERNS_RE.match(value)
         n1, n2, name = m.groups()
         n1 = int(n1)
         n2 = int(n2)
         name = SFDReadUTF7(name)
 
-        first = data[i:i + n1 - 1]
-        first = [v.split()[1:] for v in first]
+        first = [next(stream).split()[1:] for _ in range(n1 - 1)]
         first.insert(0, None)
-        i += n1 - 1
 
-        second = data[i:i + n2 - 1]
-        second = [v.split()[1:] for v in second]
+        second = [next(stream).split()[1:] for _ in range(n2 - 1)]
         second.insert(0, None)
-        i += n2 - 1
 
-        kerns = data[i]
+        kerns = next(stream)
         kerns = DEVICETABLE_RE.split(kerns)
         kerns = [int(k) for k in kerns if k]
 
         self._kernClasses[name] = (first, second, kerns)
 
-        return i + 1
-
     def _parseAnchorClass(self, data):
         assert not self._anchorClasses
         data = [SFDReadUTF7(v) for v in QUOTED_RE.findall(data)]
@@ -396,7 +742,7 @@ class SFDParser():
                 self._anchorClasses[subtable] = []
             self._anchorClasses[subtable].append(anchor)
 
-    def _parseAnchorPoint(self, glyph, data):
+    def _parseAnchorPoint(self, data):
         m = ANCHOR_RE.match(data)
         assert m
         name, x, y, kind, index = m.groups()
@@ -405,16 +751,22 @@ class SFDParser():
         y = float(y)
         index = int(index)
 
-        if self._use_ufo_anchors:
-            glyph.appendAnchor(parseAnchorPoint([name, kind, x, y, index]))
-        else:
-            if glyph.name not in self._glyphAnchors:
-                self._glyphAnchors[glyph.name] = OrderedDict()
-            if name not in self._glyphAnchors[glyph.name]:
-                self._glyphAnchors[glyph.name][name] = OrderedDict()
-            self._glyphAnchors[glyph.name][name][kind] = (x, y, index)
+        return name, kind, x, y, index
 
-    def _parsePosSub(self, glyph, key, data):
+    def _addAnchorPoint(self, glyphName, anchor):
+        name, kind, x, y, index = anchor
+
+        if glyphName not in self._glyphAnchors:
+            self._glyphAnchors[glyphName] = OrderedDict()
+        if name not in self._glyphAnchors[glyphName]:
+            self._glyphAnchors[glyphName][name] = OrderedDict()
+            # The glyphs having each anchor class, for _writeAnchorClass().
+            if name not in self._anchorClassGlyphs:
+                self._anchorClassGlyphs[name] = []
+            self._anchorClassGlyphs[name].append(glyphName)
+        self._glyphAnchors[glyphName][name][kind] = (x, y, index)
+
+    def _parsePosSub(self, key, data):
         m = SUBPOS_RE.match(data)
         assert m
 
@@ -424,22 +776,33 @@ class SFDParser():
         subtable = SFDReadUTF7(subtable)
         possub = possub.strip().split()
 
-        if glyph.name not in self._glyphPosSub:
-            self._glyphPosSub[glyph.name] = OrderedDict()
-
         if  key == "Position":
             possub = [int(p.split("=")[1]) for p in possub]
         elif key == "PairPos":
             possub = possub[:1] + [int(p.split("=")[1]) for p in possub[1:]]
 
-        if key in ("Ligature", "Substitution", "AlternateSubs", "MultipleSubs",
-                   "Position", "PairPos"):
-            if subtable not in self._glyphPosSub[glyph.name]:
-                self._glyphPosSub[glyph.name][subtable] = []
-            self._glyphPosSub[glyph.name][subtable].append((key, possub))
-        else:
+        if key not in ("Ligature", "Substitution", "AlternateSubs",
+                       "MultipleSubs", "Position", "PairPos"):
             assert False, (key, possub)
 
+        return subtable, key, possub
+
+    def _addPosSub(self, glyphName, possub):
+        subtable, key, possub = possub
+
+        if glyphName not in self._glyphPosSub:
+            self._glyphPosSub[glyphName] = OrderedDict()
+        if subtable not in self._glyphPosSub[glyphName]:
+            self._glyphPosSub[glyphName][subtable] = []
+        self._glyphPosSub[glyphName][subtable].append((key, possub))
+
+        # The rules of each subtable, in the order they are written. All the
+        # rules of a glyph are added together, so this is the same as going
+        # through _glyphPosSub glyph by glyph.
+        if subtable not in self._subtableRules:
+            self._subtableRules[subtable] = []
+        self._subtableRules[subtable].append((glyphName, possub))
+
     _LAYER_KEYWORDS = ["Back", "Fore", "Layer"]
 
     _GLYPH_CLASSES = [
@@ -451,19 +814,24 @@ class SFDParser():
         "component",
     ]
 
-    def _parseChar(self, data):
-        _, name = data.pop(0).split(": ")
+    def _parseChar(self, name, stream):
+        """Parse a glyph block into a plain dictionary, without touching the
+        font, so that it can be done in a worker process. _addChar() adds the
+        result to the font."""
         if name.startswith('"'):
             name = SFDReadUTF7(name)
 
-        glyph = self._font.newGlyph(name)
-        layerGlyph = glyph
-        unicodes = []
+        char = dict(name=name, order=None, width=None, height=None,
+                    unicodes=[], lib={}, note=None, layers=OrderedDict(),
+                    anchors=[], kerns=None, possub=[], carets=None)
+        layers = char["layers"]
+        layer = None
+        quadratic = None
+        unicodes = char["unicodes"]
 
-        i = 0
-        while i < len(data):
-            line = data[i]
-            i += 1
+        for line in stream:
+            if line.startswith("EndChar"):
+                break
 
             if ": " in line:
                 key, value = line.split(": ", 1)
@@ -471,62 +839,68 @@ class SFDParser():
                 key = line
                 value = None
 
+            if key in self._LAYER_KEYWORDS:
+                idx = value and int(value) or self._LAYER_KEYWORDS.index(key)
+                quadratic = self._layerType[idx]
+                if idx not in layers:
+                    layers[idx] = dict(width=char["width"], contours=[],
+                                       refs=[], color=None)
+                layer = layers[idx]
+                continue
+
+            if layer is None and key in ("SplineSet", "Image", "Colour", "Refer"):
+                # Before any layer keyword we are in the default layer.
+                quadratic = self._layerType[1]
+                layer = layers[1] = dict(width=None, contours=[], refs=[],
+                                         color=None)
+
             if   key == "Width":
-                glyph.width = int(value)
+                char["width"] = int(value)
             elif key == "VWidth":
-                glyph.height = int(value)
+                char["height"] = int(value)
             elif key == "Encoding":
                 enc, uni, order = [int(v) for v in value.split()]
                 if uni >= 0:
                     unicodes.append(uni)
+                char["order"] = order
             elif key == "AltUni2":
                 altuni = [int(v, 16) for v in value.split(".")]
                 altuni = _splitList(altuni, 3)
                 unicodes += parseAltuni(name, altuni, self._ignore_uvs)
             elif key == "GlyphClass":
-                glyph.lib[GLYPHCLASS_KEY] = self._GLYPH_CLASSES[int(value)]
+                char["lib"][GLYPHCLASS_KEY] = self._GLYPH_CLASSES[int(value)]
             elif key == "AnchorPoint":
-                self._parseAnchorPoint(glyph, value)
-            elif key in self._LAYER_KEYWORDS:
-                idx = value and int(value) or self._LAYER_KEYWORDS.index(key)
-                layer = self._layers[idx]
-                quadratic = self._layerType[idx]
-                if glyph.name not in layer:
-                    layerGlyph = layer.newGlyph(glyph.name)
-                    layerGlyph.width = glyph.width
-                else:
-                    layerGlyph = layer[glyph.name]
+                char["anchors"].append(self._parseAnchorPoint(value))
             elif key == "SplineSet":
-                splines, i = self._getSection(data, i, "EndSplineSet")
+                splines = self._getSection(stream, "EndSplineSet")
                 contours = self._parseSplineSet(splines)
-                self._drawContours(layerGlyph, contours, quadratic)
+                layer["contours"] += self._convertContours(contours, quadratic)
             elif key == "Image":
-                image, i = self._getSection(data, i, "EndImage", value)
-                self._parseImage(layerGlyph, image)
+                image = self._getSection(stream, "EndImage", value)
+                self._parseImage(layer, image)
             elif key == "Colour":
-                layerGlyph.markColor = parseColor(int(value, 16))
+                layer["color"] = parseColor(int(value, 16))
             elif key == "Refer":
                 # Just collect the refs here, we can’t insert them until all the
                 # glyphs are parsed since FontForge uses glyph indices not names.
                 # The calling code will process the references at the end.
-                if layerGlyph not in self._glyphRefs:
-                    self._glyphRefs[layerGlyph] = []
-                self._glyphRefs[layerGlyph].append(value)
+                layer["refs"].append(value)
             elif key == "Kerns2":
-                self._parseKerns(glyph, value)
+                assert char["kerns"] is None
+                char["kerns"] = self._parseKerns(value)
             elif key == "Comment":
-                glyph.note = SFDReadUTF7(value)
+                char["note"] = SFDReadUTF7(value)
             elif key == "UnlinkRmOvrlpSave":
-                glyph.lib[DECOMPOSEREMOVEOVERLAP_KEY] = bool(int(value))
+                char["lib"][DECOMPOSEREMOVEOVERLAP_KEY] = bool(int(value))
             elif key == "LCarets2":
                 v = [int(v) for v in value.split(" ")]
                 num = v.pop(0)
                 if any(v):
                     assert len(v) == num
-                    self._ligatureCarets[glyph.name] = v
+                    char["carets"] = v
             elif key in ("Position2", "PairPos2", "Ligature2", "Substitution2",
                          "AlternateSubs2", "MultipleSubs2"):
-                self._parsePosSub(glyph, key, value)
+                char["possub"].append(self._parsePosSub(key, value))
             elif key in ("HStem", "VStem", "DStem2", "CounterMasks"):
                 pass # XXX
             elif key == "Flags":
@@ -537,46 +911,252 @@ class SFDParser():
            #elif value is not None:
            #    print(key, value)
 
-        glyph.unicodes = unicodes
+        return char
+
+    def _addChar(self, char, collect=True):
+        """Add a glyph parsed by _parseChar() to the font, and collect its
+        font-wide data unless collect is False."""
+        name = char["name"]
+        glyph = self._font.newGlyph(name)
+
+        if char["width"] is not None:
+            glyph.width = char["width"]
+        if char["height"] is not None:
+            glyph.height = char["height"]
+        if char["note"] is not None:
+            glyph.note = char["note"]
+        glyph.lib.update(char["lib"])
+
+        if self._use_ufo_anchors:
+            for anchor in char["anchors"]:
+                glyph.appendAnchor(parseAnchorPoint(list(anchor)))
+
+        for idx, layer in char["layers"].items():
+            ufoLayer = self._layers[idx]
+            if name not in ufoLayer:
+                layerGlyph = ufoLayer.newGlyph(name)
+                if layer["width"] is not None:
+                    layerGlyph.width = layer["width"]
+            else:
+                layerGlyph = ufoLayer[name]
+            self._drawContours(layerGlyph, layer["contours"])
+            if layer["color"] is not None:
+                layerGlyph.markColor = layer["color"]
+            if layer["refs"]:
+                if layerGlyph not in self._glyphRefs:
+                    self._glyphRefs[layerGlyph] = []
+                self._glyphRefs[layerGlyph] += layer["refs"]
+
+        if collect:
+            self._addCharData(char)
+
+        glyph.unicodes = char["unicodes"]
+
+        return glyph
+
+    def _addCharData(self, char):
+        """Collect the data of a glyph parsed by _parseChar() that is used for
+        the font-wide data, and remember it for glyphData() if asked to."""
+        name = char["name"]
+
+        if not self._use_ufo_anchors:
+            for anchor in char["anchors"]:
+                self._addAnchorPoint(name, anchor)
+
+        if char["kerns"] is not None:
+            assert name not in self._glyphKerns
+            self._glyphKerns[name] = char["kerns"]
+
+        if char["carets"] is not None:
+            self._ligatureCarets[name] = char["carets"]
 
-        return glyph, order
+        for possub in char["possub"]:
+            self._addPosSub(name, possub)
+
+        glyphclass = char["lib"].get(GLYPHCLASS_KEY)
+        if glyphclass is not None:
+            self._glyphClasses[name] = glyphclass
+
+        if not self._keepGlyphData:
+            return
+
+        # Everything but the outlines; the lookup lists are copied since
+        # writing the features modifies them.
+        data = dict((k, v) for k, v in char.items() if k != "layers")
+        data["possub"] = [(s, k, list(p)) for s, k, p in char["possub"]]
+        if "layers" in char:
+            # The glyphs referenced in the default layer, the bounds of the
+            # glyph depend on them.
+            data["refs"] = []
+            for idx, layer in char["layers"].items():
+                if self._layers[idx] is self._font.layers.defaultLayer:
+                    data["refs"] = [int(r.split()[0]) for r in layer["refs"]]
+            data.pop("bounds", None)
+        self._glyphData[name] = data
+
+    def _getGlyphName(self, gid, user):
+        """Return the name of the glyph with FontForge glyph index gid, which
+        is referenced by glyph user."""
+        try:
+            return self._glyphNames[gid]
+        except KeyError:
+            raise Exception("Glyph %s references glyph index %d which is out "
+                            "of range" % (user, gid))
 
     def _processReferences(self):
         for glyph, refs in self._glyphRefs.items():
-            pen = glyph.getPen()
-
+            components = []
             for ref in refs:
                 ref = ref.split()
-                name = self._font.glyphOrder[int(ref[0])]
-                matrix = [float(v) for v in ref[3:9]]
+                name = self._getGlyphName(int(ref[0]), glyph.name)
+                matrix = tuple(float(v) for v in ref[3:9])
+                components.append((name, matrix))
+
+            pen = glyph.getPointPen()
+            for name, matrix in components:
                 pen.addComponent(name, matrix)
 
+        self._glyphRefs.clear()
+
     def _processKerns(self):
+        kerning = {}
         for name1 in self._glyphKerns:
             for gid2, kern in self._glyphKerns[name1]:
-                name2 = self._font.glyphOrder[gid2]
-                self._font.kerning[name1, name2] = kern
+                name2 = self._getGlyphName(gid2, name1)
+                kerning[name1, name2] = kern
+        self._font.kerning.update(kerning)
+
+        self._glyphKerns.clear()
 
-    def _parseChars(self, data):
+    def _parseCharBlock(self, data):
+        stream = _lines(data.splitlines())
+        for line in stream:
+            if line.startswith("StartChar"):
+                _, name = line.split(": ")
+                return self._parseChar(name, stream)
+
+    def _parseCharsParallel(self, worker, units):
+        """Parse the glyph blocks in a pool of worker processes, yielding the
+        results in the original order.
+
+        units are byte ranges of the chars section or glyph file names, passed
+        to worker in chunks."""
+        import multiprocessing
+
+        chunks = _splitList(units, max(len(units) // (self._jobs * 4), 1))
+        pool = multiprocessing.Pool(self._jobs, _initCharsWorker,
+            (self._path, self._ignore_uvs, self._layerType))
+        try:
+            for chars in pool.imap(worker, chunks):
+                for char in chars:
+                    yield char
+        finally:
+            pool.terminate()
+
+    def _addChars(self, chars):
         font = self._font
         glyphOrderMap = {}
 
-        data = [l.strip() for l in data if l.strip()]
-
-        i = 0
-        while i < len(data):
-            line = data[i]
-            i += 1
+        if self._cache is not None:
+            # Keep the parsed glyphs around for the cache.
+            chars = self._chars = list(chars)
 
-            if line.startswith("StartChar"):
-                char, i = self._getSection(data, i, "EndChar", line)
-                glyph, order = self._parseChar(char)
-                glyphOrderMap[glyph.name] = order
+        with phase(self._hooks, "chars"), notificationsDisabled(font):
+            for char in chars:
+                glyph = self._addChar(char)
+                glyphOrderMap[glyph.name] = char["order"]
 
-        # Change the glyph order to match FontForge’s, we need this for processing
-        # the references below.
-        assert len(font.glyphOrder) == len(glyphOrderMap)
+        # Change the glyph order to match FontForge’s, and map the glyph
+        # indices to names for processing the references below.
+        assert len(font) == len(glyphOrderMap)
         font.glyphOrder = sorted(glyphOrderMap, key=glyphOrderMap.get)
+        self._glyphNames = dict((v, k) for k, v in glyphOrderMap.items())
+
+    def _indexChar(self, line):
+        _, name = line.split(": ")
+        name = name.strip()
+        if name.startswith('"'):
+            name = SFDReadUTF7(name)
+        return name
+
+    def _indexChars(self, reader):
+        """Record the location of each glyph block in the chars section,
+        without parsing them."""
+        records = []
+
+        for offset, length in reader.sections(b"StartChar:", b"EndChar",
+                                              b"EndChars"):
+            name = self._indexChar(reader.line(offset))
+            encoding = order = None
+            pos = reader.find(b"\nEncoding:", offset, offset + length)
+            if pos >= 0:
+                _, value = reader.line(pos + 1).split(":")
+                encoding, _, order = [int(v) for v in value.split()]
+            records.append(GlyphRecord(name, encoding, order, self._path,
+                                       offset, length))
+
+        self._setGlyphIndex(records)
+
+    def _indexGlyphFiles(self):
+        """Record the location of each glyph file in an SFDIR directory,
+        without parsing them."""
+        records = []
+
+        for filename in _glyphFiles(self._path):
+            name = encoding = order = None
+            with open(filename, "rb") as fp:
+                for line in fp:
+                    if line.startswith(b"StartChar:"):
+                        name = self._indexChar(line.decode("utf-8"))
+                    elif line.startswith(b"Encoding:"):
+                        encoding, _, order = [int(v) for v in line[9:].split()]
+                        break
+            records.append(GlyphRecord(name, encoding, order, filename, 0,
+                                       os.path.getsize(filename)))
+
+        self._setGlyphIndex(records)
+
+    def _setGlyphIndex(self, records):
+        # Glyphs in the order they are found in the font, which is the order
+        # parse() adds them in.
+        self._glyphRecords = records
+        records = sorted(records, key=lambda r: r.order)
+        self._glyphIndex = OrderedDict((r.name, r) for r in records)
+        self._font.glyphOrder = list(self._glyphIndex)
+        self._glyphNames = dict((r.order, r.name) for r in records)
+
+    def _readRecords(self, records):
+        """Iterate over the raw SFD data of indexed glyph records."""
+        fp = None
+        try:
+            for record in records:
+                if fp is None or fp.name != record.path:
+                    if fp is not None:
+                        fp.close()
+                    fp = open(record.path, "rb")
+                fp.seek(record.offset)
+                yield record, fp.read(record.length)
+        finally:
+            if fp is not None:
+                fp.close()
+
+    def _readRecord(self, record):
+        with open(record.path, "rb") as fp:
+            fp.seek(record.offset)
+            return fp.read(record.length).decode("utf-8")
+
+    def _loadGlyph(self, name):
+        """Parse a glyph from its indexed block."""
+        data = self._readRecord(self._glyphIndex[name])
+
+        # Its font-wide data are collected by parse(), in glyph order.
+        char = self._parseCharBlock(data)
+        glyph = self._addChar(char, collect=False)
+        self._loadedChars[name] = char
+
+        self._processReferences()
+
+        return glyph
 
     _LOOKUP_TYPES = {
         0x001: "gsub_single",
@@ -641,6 +1221,7 @@ class SFDParser():
                 features[-1].append((script, TAG_RE.findall(langs)))
 
         self._lookupInfo[lookup] = (self._LOOKUP_TYPES[kind], flags, features)
+        self._lookupLangSystems[lookup] = _flattenFeatures(features)
 
     _OFFSET_METRICS = {
         "HheadAOffset": "openTypeHheaAscender",
@@ -651,9 +1232,45 @@ class SFDParser():
         "OS2WinDOffset": "openTypeOS2WinDescent",
     }
 
+    def _getFontBounds(self):
+        """Calculate the font bounds from the glyph bounds, reusing the bounds
+        kept in glyphData() for glyphs that did not change."""
+        if not self._keepGlyphData:
+            return self._font.bounds
+
+        layer = self._font.layers.defaultLayer
+        glyphData = self._glyphData
+        stale = {}
+
+        def isStale(name):
+            # A glyph needs new bounds if it was parsed now or if any of its
+            # components does.
+            if name not in stale:
+                stale[name] = True # Reference loops.
+                data = glyphData[name]
+                stale[name] = "bounds" not in data or any(
+                    isStale(self._glyphNames[gid]) for gid in data["refs"])
+            return stale[name]
+
+        bounds = None
+        for name in glyphData:
+            if isStale(name):
+                glyphBounds = layer[name].bounds
+                glyphData[name]["bounds"] = glyphBounds and list(glyphBounds)
+            glyphBounds = glyphData[name]["bounds"]
+            if glyphBounds is None:
+                continue
+            if bounds is None:
+                bounds = glyphBounds
+            else:
+                bounds = unionRect(bounds, glyphBounds)
+        return bounds
+
     def _fixOffsetMetrics(self, metrics):
         info = self._font.info
-        bounds = getFontBounds(self._font.bounds)
+        if not metrics:
+            return
+        bounds = getFontBounds(self._getFontBounds())
         for metric in metrics:
             value = getattr(info, metric)
 
@@ -672,17 +1289,21 @@ class SFDParser():
 
             setattr(info, metric, value)
 
-    def _writeGDEF(self):
+    # The GDEF glyph classes, in GlyphClassDef order, and the names of their
+    # glyph class definitions.
+    _GDEF_CLASSES = (
+        ("baseglyph", "GDEF_Simple"),
+        ("baseligature", "GDEF_Ligature"),
+        ("mark", "GDEF_Mark"),
+        ("component", "GDEF_Component"),
+    )
+
+    def _glyphClassDefs(self):
+        """Return the glyphs of each GDEF glyph class, in glyph order."""
         font = self._font
-        classNames = OrderedDict()
-        classNames["baseglyph"] = "@GDEF_Simple"
-        classNames["baseligature"] = "@GDEF_Ligature"
-        classNames["mark"] = "@GDEF_Mark"
-        classNames["component"] = "@GDEF_Component"
         gdef = {}
         for name in font.glyphOrder:
-            glyph = font[name]
-            glyphclass = glyph.lib.get(GLYPHCLASS_KEY)
+            glyphclass = self._glyphClasses.get(name)
             if glyphclass is None:
                 if name == ".notdef":
                     continue
@@ -698,31 +1319,34 @@ class SFDParser():
                 gdef[glyphclass] = []
             gdef[glyphclass].append(name)
 
+        return gdef
+
+    def _writeGDEF(self, fea):
+        gdef = self._glyphClassDefs()
+
         # Ugly code to match FontForge output for easy comparison, should be
         # cleaned up once the dust settles.
         lines = []
         lines.append("#Mark attachment classes (defined in GDEF, used in lookupflags)")
         lines.append("")
-        for name in classNames:
+        for name, classname in self._GDEF_CLASSES:
             if name not in gdef:
                 continue
-            classname = classNames[name]
+            classname = "@" + classname
             glyphs = gdef[name]
-            lines.append("%s = [" % classname)
+            line = ["%s = [" % classname]
             n = len(classname) + 8
             for glyph in glyphs:
                 if n + len(glyph) + 1 > 80:
-                    lines[-1] += "\n\t"
+                    line.append("\n\t")
                     n = 8
-                lines[-1] += "\\" + glyph + " "
+                line.append("\\" + glyph + " ")
                 n += len(glyph) + 1
-            lines[-1] += "];"
+            line.append("];")
+            lines.append("".join(line))
         names = []
-        for name in classNames:
-            classname = ""
-            if name in gdef:
-                classname = classNames[name]
-            names.append(classname)
+        for name, classname in self._GDEF_CLASSES:
+            names.append(name in gdef and "@" + classname or "")
         lines.append("")
         lines.append("table GDEF {")
         lines.append("  GlyphClassDef " + ", ".join(names) + ";")
@@ -735,9 +1359,7 @@ class SFDParser():
         lines.append("")
         lines.append("")
 
-        if font.features.text is None:
-            font.features.text = "\n"
-        font.features.text += "\n".join(lines)
+        fea.append("\n".join(lines))
 
     _SHORT_LOOKUP_TYPES = {
         "gsub_single": "single",
@@ -763,20 +1385,17 @@ class SFDParser():
 
         assert isgpos is not None
 
-        out = ""
-        for i, ch in enumerate(lookup):
-            if ord(ch) >= 127:
-                continue
-            if ch.isalpha():
-                out += ch
-            elif ch in (".", "_"):
-                out += ch
-            elif i != 0 and ch.isdigit():
-                out += ch
+        # Keep ASCII letters, digits (but not as the first character), "."
+        # and "_".
+        out = LOOKUPNAME_RE.sub("", lookup[1:])
+        if lookup[:1] not in "0123456789":
+            out = LOOKUPNAME_RE.sub("", lookup[:1]) + out
         out = out[:63]
 
-        if out not in self._sanitizedLookupNames.values():
+        used = self._usedLookupNames
+        if out not in used:
             self._sanitizedLookupNames[lookup] = out
+            used.add(out)
         else:
             kind, _, fealangsys = self._lookupInfo[lookup]
             feat = ""
@@ -787,14 +1406,19 @@ class SFDParser():
                 for langsys in fealangsys[0]:
                     if langsys[0] != "DFLT":
                         script = langsys[0]
-            i = 0
+            prefix = "%s_%s_%s%s_" % (isgpos and "pos" or "sub", kind,
+                feat, script)
+            # Names are never released, so the numbers tried before for the
+            # same prefix are still taken.
+            i = self._lookupNameCounters.get(prefix, 0)
             while True:
-                out = "%s_%s_%s%s_%d" % (isgpos and "pos" or "sub", kind,
-                    feat, script, i)
-                if out not in self._sanitizedLookupNames.values():
+                out = "%s%d" % (prefix, i)
+                if out not in used:
                     self._sanitizedLookupNames[lookup] = out
+                    used.add(out)
                     break
                 i += 2
+            self._lookupNameCounters[prefix] = i
 
         return self._sanitizedLookupNames[lookup]
 
@@ -813,42 +1437,62 @@ class SFDParser():
     def _pruneSubtables(self, subtables, isgpos):
         out = []
         for sub in subtables:
-            if any(sub in self._glyphPosSub[g] for g in self._glyphPosSub):
+            if sub in self._subtableRules:
                 out.append(sub)
             elif sub in self._anchorClasses:
                 out.append(sub)
 
         return out
 
-    def _writeAnchorClass(self, lookup, subtable):
-        lines = []
-
+    def _anchorClassRules(self, lookup, subtable):
+        """Return the cursive attachments of an anchor class subtable as
+        (glyph, entry, exit) tuples, and the glyphs of its marks and bases
+        keyed by their anchor position and anchor class."""
+        cursive = []
         kind, _, _ = self._lookupInfo[lookup]
 
+        if self._glyphPositions is None:
+            self._glyphPositions = dict((name, i) for i, name in
+                                        enumerate(self._font.glyphOrder))
+        positions = self._glyphPositions
+
         bases = OrderedDict()
         marks = OrderedDict()
         for anchorClass in self._anchorClasses[subtable]:
-            for glyph in self._font.glyphOrder:
-                if glyph in self._glyphAnchors and anchorClass in self._glyphAnchors[glyph]:
-                    anchor = self._glyphAnchors[glyph][anchorClass]
-                    if kind == "gpos_cursive":
-                        entry = anchor.get("entry")
-                        exit = anchor.get("exit")
-                        if entry or exit:
-                            entry = _dumpAnchor(entry)
-                            exit = _dumpAnchor(exit)
-                            lines.append("    pos cursive \\%s %s %s;" % (glyph, entry, exit))
-                    else:
-                        mark = anchor.get("mark")
-                        base = anchor.get("basechar", anchor.get("basemark"))
-                        if mark:
-                            if (mark[:2], anchorClass) not in marks:
-                                marks[mark[:2], anchorClass] = []
-                            marks[mark[:2], anchorClass].append(glyph)
-                        if base:
-                            if (base[:2], anchorClass) not in bases:
-                                bases[base[:2], anchorClass] = []
-                            bases[base[:2], anchorClass].append(glyph)
+            glyphs = [g for g in self._anchorClassGlyphs.get(anchorClass, [])
+                      if g in positions]
+            glyphs.sort(key=positions.get)
+            for glyph in glyphs:
+                anchor = self._glyphAnchors[glyph][anchorClass]
+                if kind == "gpos_cursive":
+                    entry = anchor.get("entry")
+                    exit = anchor.get("exit")
+                    if entry or exit:
+                        cursive.append((glyph, entry, exit))
+                else:
+                    mark = anchor.get("mark")
+                    base = anchor.get("basechar", anchor.get("basemark"))
+                    if mark:
+                        if (mark[:2], anchorClass) not in marks:
+                            marks[mark[:2], anchorClass] = []
+                        marks[mark[:2], anchorClass].append(glyph)
+                    if base:
+                        if (base[:2], anchorClass) not in bases:
+                            bases[base[:2], anchorClass] = []
+                        bases[base[:2], anchorClass].append(glyph)
+
+        return cursive, marks, bases
+
+    def _writeAnchorClass(self, lookup, subtable):
+        lines = []
+
+        kind, _, _ = self._lookupInfo[lookup]
+        cursive, marks, bases = self._anchorClassRules(lookup, subtable)
+
+        for glyph, entry, exit in cursive:
+            entry = _dumpAnchor(entry)
+            exit = _dumpAnchor(exit)
+            lines.append("    pos cursive \\%s %s %s;" % (glyph, entry, exit))
 
         for (mark, anchorClass), glyphs in marks.items():
             mark = _dumpAnchor(mark)
@@ -866,10 +1510,9 @@ class SFDParser():
 
         return lines
 
-    def _writeGSUBGPOS(self, isgpos=False):
-        # Ugly as hell, rewrite later.
-        font = self._font
-
+    def _tableLookups(self, isgpos):
+        """Return the non-empty lookups of GPOS or GSUB, and the names of the
+        lookups of each of their features, scripts and languages."""
         if isgpos:
             tableLookups = self._gposLookups
         else:
@@ -884,49 +1527,29 @@ class SFDParser():
             if any(self._pruneSubtables(subtables, isgpos)):
                 lookups[lookup] = subtables
 
+        # The lookups of each feature, script and language, features are in
+        # the order they first appear in and the scripts and languages are
+        # sorted when writing them.
+        features = OrderedDict()
+        for lookup in lookups:
+            name = self._santizeLookupName(lookup)
+            for feature, script, language in self._lookupLangSystems[lookup]:
+                if feature not in features:
+                    features[feature] = {}
+                if script not in features[feature]:
+                    features[feature][script] = {}
+                if language not in features[feature][script]:
+                    features[feature][script][language] = []
+                features[feature][script][language].append(name)
+
+        return lookups, features
+
+    def _writeGSUBGPOS(self, fea, isgpos=False):
+        # Ugly as hell, rewrite later.
+        lookups, features = self._tableLookups(isgpos)
         if not lookups:
             return
 
-        featureSet = []
-        scriptSet = set()
-        langSet = {}
-        for lookup in lookups:
-            _, _, fealangsys = self._lookupInfo[lookup]
-            for feature in fealangsys:
-                if feature[0] not in featureSet:
-                    featureSet.append(feature[0])
-                for script, languages in feature[1:]:
-                    scriptSet.add(script)
-                    if script not in langSet:
-                        langSet[script] = set()
-                    langSet[script].update(languages)
-
-        scriptSet = sorted(scriptSet)
-        langSet = {s: sorted(langSet[s], key=lambda l: l == "dflt" and "0" or l) for s in langSet}
-
-        features = OrderedDict()
-        for feature in featureSet:
-            outf = OrderedDict()
-            for script in scriptSet:
-                outs = OrderedDict()
-                for language in langSet[script]:
-                    outl = []
-                    for lookup in lookups:
-                        _, _, fealangsys = self._lookupInfo[lookup]
-                        for fl in fealangsys:
-                            if feature == fl[0]:
-                                for sl in fl[1:]:
-                                    if script == sl[0]:
-                                        for ll in sl[1]:
-                                            if language == ll:
-                                                outl.append(self._santizeLookupName(lookup))
-                    if outl:
-                        outs[language] = outl
-                if outs:
-                    outf[script] = outs
-            if outf:
-                features[feature] = outf
-
         lines = []
         lines.append("# %s " % (isgpos and "GPOS" or "GSUB"))
         lines.append("")
@@ -941,313 +1564,622 @@ class SFDParser():
                 if subtable in self._anchorClasses:
                     lines += self._writeAnchorClass(lookup, subtable)
                     continue
-                for glyph in self._glyphPosSub:
-                    if subtable in self._glyphPosSub[glyph]:
-                        for _, possub in self._glyphPosSub[glyph][subtable]:
-                            if kind.startswith("gsub_"):
-                                possub = " \\".join(possub)
-
-                            if   kind in ("gsub_single", "gsub_multiple"):
-                                lines.append("    sub \\%s by \\%s ;" % (glyph, possub))
-                            elif kind == "gsub_alternate":
-                                lines.append("    sub \\%s from [\\%s ];" % (glyph, possub))
-                            elif kind == "gsub_ligature":
-                                lines.append("    sub \\%s  by \\%s;" % (possub, glyph))
-                            elif kind == "gpos_single":
-                                possub = " ".join([str(v) for v in possub])
-                                lines.append("    pos \\%s <%s>;" % (glyph, possub))
-                            elif kind == "gpos_pair":
-                                glyph2 = possub.pop(0)
-                                pos1 = " ".join([str(v) for v in possub[:4]])
-                                pos2 = " ".join([str(v) for v in possub[4:]])
-                                lines.append("    pos \\%s <%s> \\%s <%s>;" % (glyph, pos1, glyph2, pos2))
-                            else:
-                                assert False, (kind, possub)
+                for glyph, possub in self._subtableRules.get(subtable, []):
+                    if kind.startswith("gsub_"):
+                        possub = " \\".join(possub)
+
+                    if   kind in ("gsub_single", "gsub_multiple"):
+                        lines.append("    sub \\%s by \\%s ;" % (glyph, possub))
+                    elif kind == "gsub_alternate":
+                        lines.append("    sub \\%s from [\\%s ];" % (glyph, possub))
+                    elif kind == "gsub_ligature":
+                        lines.append("    sub \\%s  by \\%s;" % (possub, glyph))
+                    elif kind == "gpos_single":
+                        possub = " ".join([str(v) for v in possub])
+                        lines.append("    pos \\%s <%s>;" % (glyph, possub))
+                    elif kind == "gpos_pair":
+                        glyph2 = possub.pop(0)
+                        pos1 = " ".join([str(v) for v in possub[:4]])
+                        pos2 = " ".join([str(v) for v in possub[4:]])
+                        lines.append("    pos \\%s <%s> \\%s <%s>;" % (glyph, pos1, glyph2, pos2))
+                    else:
+                        assert False, (kind, possub)
             lines.append("} %s;" % self._santizeLookupName(lookup))
 
         for feature in features:
             lines.append("")
             lines.append("feature %s {" % feature)
-            for script in features[feature]:
+            for script in sorted(features[feature]):
                 lines.append("")
                 lines.append(" script %s;" % script)
-                for language in features[feature][script]:
+                languages = features[feature][script]
+                for language in sorted(languages, key=lambda l: l == "dflt" and "0" or l):
                     lines.append("     language %s %s;" % (language, language != "dflt" and "exclude_dflt" or ""))
-                    for lookup in features[feature][script][language]:
+                    for lookup in languages[language]:
                         lines.append("      lookup %s;" % lookup)
             lines.append("} %s;" % feature)
 
         lines.append("")
 
-        if font.features.text is None:
-            font.features.text = "\n"
-        font.features.text += "\n".join(lines)
+        fea.append("\n".join(lines))
 
-    def parse(self):
-        isdir = os.path.isdir(self._path)
-        if isdir:
-            props = os.path.join(self._path, "font.props")
-            if os.path.isfile(props):
-                with open(props) as fd:
-                    data = fd.readlines()
+    def _markClass(self, doc, anchorClass):
+        from fontTools.feaLib import ast
+        name = self._sanitizeName(anchorClass)
+        if name not in doc.markClasses:
+            doc.markClasses[name] = ast.MarkClass(name)
+        return doc.markClasses[name]
+
+    def _buildAnchorClass(self, doc, block, lookup, subtable):
+        from fontTools.feaLib import ast
+        kind, _, _ = self._lookupInfo[lookup]
+        cursive, marks, bases = self._anchorClassRules(lookup, subtable)
+
+        for glyph, entry, exit in cursive:
+            block.statements.append(ast.CursivePosStatement(
+                ast.GlyphName(glyph), _feaAnchor(entry), _feaAnchor(exit)))
+
+        for (mark, anchorClass), glyphs in marks.items():
+            markClass = self._markClass(doc, anchorClass)
+            definition = ast.MarkClassDefinition(markClass, _feaAnchor(mark),
+                                                 ast.GlyphClass(glyphs))
+            markClass.addDefinition(definition)
+            block.statements.append(definition)
+
+        for (base, anchorClass), glyphs in bases.items():
+            markClass = self._markClass(doc, anchorClass)
+            pos = kind.split("2")[1]
+            assert pos != "ligature" # XXX
+            if pos == "base":
+                statement = ast.MarkBasePosStatement
             else:
-                raise Exception("Not an SFD directory")
+                statement = ast.MarkMarkPosStatement
+            block.statements.append(statement(
+                ast.GlyphClass(glyphs), [(_feaAnchor(base), markClass)]))
+
+    def _buildRule(self, kind, glyph, possub):
+        from fontTools.feaLib import ast
+        if kind in ("gsub_single", "gsub_multiple", "gsub_alternate"):
+            if kind == "gsub_alternate":
+                return ast.AlternateSubstStatement([], ast.GlyphName(glyph), [],
+                                                   ast.GlyphClass(possub))
+            return _feaSubst([glyph], possub)
+        elif kind == "gsub_ligature":
+            return _feaSubst(possub, [glyph])
+        elif kind == "gpos_single":
+            return ast.SinglePosStatement(
+                [(ast.GlyphName(glyph), ast.ValueRecord(*possub[:4]))],
+                [], [], False)
+        elif kind == "gpos_pair":
+            return ast.PairPosStatement(
+                ast.GlyphName(glyph), ast.ValueRecord(*possub[1:5]),
+                ast.GlyphName(possub[0]), ast.ValueRecord(*possub[5:9]))
         else:
-            with open(self._path) as fd:
-                data = fd.readlines()
+            assert False, (kind, possub)
 
-        font = self._font
-        info = font.info
+    def _buildGSUBGPOS(self, doc, isgpos=False):
+        """Add the lookups and features of GPOS or GSUB to the doc feaLib
+        AST, the same as _writeGSUBGPOS() writes them."""
+        from fontTools.feaLib import ast
+        lookups, features = self._tableLookups(isgpos)
+        if not lookups:
+            return
 
-        charData = None
-        offsetMetrics = []
+        statements = doc.statements
+        statements.append(ast.Comment("# %s " % (isgpos and "GPOS" or "GSUB")))
 
-        i = 0
-        while i < len(data):
-            line = data[i]
-            i += 1
+        blocks = {}
+        for lookup in lookups:
+            kind, flags, _ = self._lookupInfo[lookup]
+            name = self._santizeLookupName(lookup)
+            block = blocks[name] = ast.LookupBlock(name)
+            value = sum(i for i, flag in self._LOOKUP_FLAGS.items()
+                        if flag in flags)
+            block.statements.append(ast.LookupFlagStatement(value))
+            for subtable in lookups[lookup]:
+                if subtable in self._anchorClasses:
+                    self._buildAnchorClass(doc, block, lookup, subtable)
+                    continue
+                for glyph, possub in self._subtableRules.get(subtable, []):
+                    block.statements.append(
+                        self._buildRule(kind, glyph, possub))
+            statements.append(block)
 
-            if ":" in line:
-                key, value = [v.strip() for v in line.split(":", 1)]
-            else:
-                key = line.strip()
-                value = None
+        for feature in features:
+            block = ast.FeatureBlock(feature)
+            for script in sorted(features[feature]):
+                block.statements.append(ast.ScriptStatement(script))
+                languages = features[feature][script]
+                for language in sorted(languages, key=lambda l: l == "dflt" and "0" or l):
+                    block.statements.append(ast.LanguageStatement(
+                        language, include_default=language == "dflt"))
+                    for lookup in languages[language]:
+                        block.statements.append(
+                            ast.LookupReferenceStatement(blocks[lookup]))
+            statements.append(block)
+
+    def _buildGDEF(self, doc):
+        """Add the GDEF glyph classes and table to the doc feaLib AST, the
+        same as _writeGDEF() writes them."""
+        from fontTools.feaLib import ast
+        gdef = self._glyphClassDefs()
+
+        statements = doc.statements
+        statements.append(ast.Comment(
+            "#Mark attachment classes (defined in GDEF, used in lookupflags)"))
+        classes = []
+        for name, classname in self._GDEF_CLASSES:
+            if name not in gdef:
+                classes.append(None)
+                continue
+            definition = ast.GlyphClassDefinition(classname,
+                                                  ast.GlyphClass(gdef[name]))
+            statements.append(definition)
+            classes.append(ast.GlyphClassName(definition))
+
+        table = ast.TableBlock("GDEF")
+        base, ligature, mark, component = classes
+        table.statements.append(
+            ast.GlyphClassDefStatement(base, mark, ligature, component))
+        for k, v in self._ligatureCarets.items():
+            table.statements.append(
+                ast.LigatureCaretByPosStatement(ast.GlyphName(k), list(v)))
+        statements.append(table)
+
+
+    # Header keys that map directly to a font info attribute, with an optional
+    # function to convert the value.
+    _INFO_KEYS = {
+        "FontName": ("postscriptFontName", None),
+        "FullName": ("postscriptFullName", None),
+        "FamilyName": ("familyName", None),
+        "Weight": ("postscriptWeightName", None),
+        "Copyright": ("copyright", _decodeEscapes),
+        "Comments": ("note", None),
+        "UnderlinePosition": ("postscriptUnderlinePosition", float),
+        "UnderlineWidth": ("postscriptUnderlineThickness", float),
+        "Ascent": ("ascender", int),
+        "Descent": ("descender", lambda v: -int(v)),
+        "CreationTime": ("openTypeHeadCreated", _parseTimestamp),
+        "FSType": ("openTypeOS2Type", lambda v: _parseBits(int(v), 16)),
+        "TTFWeight": ("openTypeOS2WeightClass", int),
+        "PfmWeight": ("openTypeOS2WeightClass", int),
+        "TTFWidth": ("openTypeOS2WidthClass", int),
+        "Panose": ("openTypeOS2Panose", lambda v: [int(n) for n in v.split()]),
+        "LineGap": ("openTypeHheaLineGap", int),
+        "VLineGap": ("openTypeVheaVertTypoLineGap", int),
+        "HheadAscent": ("openTypeHheaAscender", int),
+        "HheadDescent": ("openTypeHheaDescender", int),
+        "OS2TypoLinegap": ("openTypeOS2TypoLineGap", int),
+        "OS2Vendor": ("openTypeOS2VendorID", lambda v: v.strip("'")),
+        "OS2FamilyClass": ("openTypeOS2FamilyClass",
+                           lambda v: (int(v) >> 8, int(v) & 0xff)),
+        "OS2TypoAscent": ("openTypeOS2TypoAscender", int),
+        "OS2TypoDescent": ("openTypeOS2TypoDescender", int),
+        "OS2WinAscent": ("openTypeOS2WinAscent", int),
+        "OS2WinDescent": ("openTypeOS2WinDescent", int),
+        "OS2SubXSize": ("openTypeOS2SubscriptXSize", int),
+        "OS2SubYSize": ("openTypeOS2SubscriptYSize", int),
+        "OS2SubXOff": ("openTypeOS2SubscriptXOffset", int),
+        "OS2SubYOff": ("openTypeOS2SubscriptYOffset", int),
+        "OS2SupXSize": ("openTypeOS2SuperscriptXSize", int),
+        "OS2SupYSize": ("openTypeOS2SuperscriptYSize", int),
+        "OS2SupXOff": ("openTypeOS2SuperscriptXOffset", int),
+        "OS2SupYOff": ("openTypeOS2SuperscriptYOffset", int),
+        "OS2StrikeYSize": ("openTypeOS2StrikeoutSize", int),
+        "OS2StrikeYPos": ("openTypeOS2StrikeoutPosition", int),
+        "OS2CapHeight": ("capHeight", int),
+        "OS2XHeight": ("xHeight", int),
+        "UniqueID": ("postscriptUniqueID", int),
+    }
 
-            if i == 1:
-                if key != "SplineFontDB":
-                    raise Exception("Not an SFD file.")
-                version = float(value)
-                if version != 3.0:
-                    raise Exception("Unsupported SFD version: %f" % version)
-
-            elif key == "FontName":
-                info.postscriptFontName = value
-            elif key == "FullName":
-                info.postscriptFullName = value
-            elif key == "FamilyName":
-                info.familyName = value
-            elif key == "DefaultBaseFilename":
-                pass # info.XXX = value
-            elif key == "Weight":
-                info.postscriptWeightName = value
-            elif key == "Copyright":
-                # Decode escape sequences.
-                info.copyright = codecs.escape_decode(value)[0].decode("utf-8")
-            elif key == "Comments":
-                info.note = value
-            elif key == "UComments":
-                old = info.note
-                info.note = SFDReadUTF7(value)
-                if old:
-                    info.note += "\n" + old
-            elif key == "FontLog":
-                if not info.note:
-                    info.note = ""
-                else:
-                    info.note = "\n"
-                info.note += "Font log:\n" + SFDReadUTF7(value)
-            elif key == "Version":
-                info.versionMajor, info.versionMinor = parseVersion(value)
-            elif key == "ItalicAngle":
-                info.italicAngle = info.postscriptSlantAngle = float(value)
-            elif key == "UnderlinePosition":
-                info.postscriptUnderlinePosition = float(value)
-            elif key == "UnderlineWidth":
-                info.postscriptUnderlineThickness = float(value)
-            elif key in "Ascent":
-                info.ascender = int(value)
-            elif key in "Descent":
-                info.descender = -int(value)
-            elif key == "sfntRevision":
-                pass # info.XXX = int(value, 16)
-            elif key == "WidthSeparation":
-                pass # XXX = float(value) # auto spacing
-            elif key == "LayerCount":
-                self._layers = int(value) * [None]
-                self._layerType = int(value) * [None]
-            elif key == "Layer":
-                m = LAYER_RE.match(value)
-                idx, quadratic, name, _ = m.groups()
-                idx = int(idx)
-                quadratic = bool(int(quadratic))
-                name = SFDReadUTF7(name)
-                if idx == 1:
-                    self._layers[idx] = font.layers.defaultLayer
-                else:
-                    self._layers[idx] = name
-                self._layerType[idx] = quadratic
-            elif key == "DisplayLayer":
-                pass # XXX default layer
-            elif key == "DisplaySize":
-                pass # GUI
-            elif key == "AntiAlias":
-                pass # GUI
-            elif key == "FitToEm":
-                pass # GUI
-            elif key == "WinInfo":
-                pass # GUI
-            elif key == "Encoding":
-                pass # XXX encoding = value
-            elif key == "CreationTime":
-                v = datetime.utcfromtimestamp(int(value))
-                info.openTypeHeadCreated = v.strftime("%Y/%m/%d %H:%M:%S")
-            elif key == "ModificationTime":
-                pass # XXX
-            elif key == "FSType":
-                v = int(value)
-                v = [bit for bit in range(16) if v & (1 << bit)]
-                info.openTypeOS2Type = v
-            elif key == "PfmFamily":
-                pass # info.XXX = value
-            elif key in ("TTFWeight", "PfmWeight"):
-                info.openTypeOS2WeightClass = int(value)
-            elif key == "TTFWidth":
-                info.openTypeOS2WidthClass = int(value)
-            elif key == "Panose":
-                v = value.split()
-                info.openTypeOS2Panose = [int(n) for n in v]
-            elif key == "LineGap":
-                info.openTypeHheaLineGap = int(value)
-            elif key == "VLineGap":
-                info.openTypeVheaVertTypoLineGap = int(value)
-            elif key == "HheadAscent":
-                info.openTypeHheaAscender = int(value)
-            elif key == "HheadDescent":
-                info.openTypeHheaDescender = int(value)
-            elif key == "OS2TypoLinegap":
-                info.openTypeOS2TypoLineGap = int(value)
-            elif key == "OS2Vendor":
-                info.openTypeOS2VendorID = value.strip("'")
-            elif key == "OS2FamilyClass":
-                v = int(value)
-                info.openTypeOS2FamilyClass = (v >> 8, v & 0xff)
-            elif key == "OS2Version":
-                pass # XXX
-            elif key == "OS2_WeightWidthSlopeOnly":
-                if int(value):
-                    if not info.openTypeOS2Selection:
-                        info.openTypeOS2Selection = []
-                    info.openTypeOS2Selection += [8]
-            elif key == "OS2_UseTypoMetrics":
-                if not info.openTypeOS2Selection:
-                    info.openTypeOS2Selection = []
-                info.openTypeOS2Selection += [7]
-            elif key == "OS2CodePages":
-                pass # XXX
-            elif key == "OS2UnicodeRanges":
-                pass # XXX
-            elif key == "OS2TypoAscent":
-                info.openTypeOS2TypoAscender = int(value)
-            elif key == "OS2TypoDescent":
-                info.openTypeOS2TypoDescender = int(value)
-            elif key == "OS2WinAscent":
-                info.openTypeOS2WinAscent = int(value)
-            elif key == "OS2WinDescent":
-                info.openTypeOS2WinDescent = int(value)
+    # Header keys we know about but don’t handle (yet):
+    #   DefaultBaseFilename, sfntRevision, ModificationTime, PfmFamily,
+    #   OS2Version, OS2CodePages, OS2UnicodeRanges, XUID, UnicodeInterp,
+    #   NameList, DEI, Encoding
+    #   WidthSeparation: auto spacing
+    #   DisplayLayer: default layer
+    #   DisplaySize, AntiAlias, FitToEm, WinInfo: GUI
+
+    def _parseUComments(self, value):
+        info = self._font.info
+        old = info.note
+        info.note = SFDReadUTF7(value)
+        if old:
+            info.note += "\n" + old
+
+    def _parseFontLog(self, value):
+        info = self._font.info
+        if not info.note:
+            info.note = ""
+        else:
+            info.note = "\n"
+        info.note += "Font log:\n" + SFDReadUTF7(value)
+
+    def _parseVersion(self, value):
+        info = self._font.info
+        info.versionMajor, info.versionMinor = parseVersion(value)
+
+    def _parseItalicAngle(self, value):
+        info = self._font.info
+        info.italicAngle = info.postscriptSlantAngle = float(value)
+
+    def _parseLayerCount(self, value):
+        self._layers = int(value) * [None]
+        self._layerType = int(value) * [None]
+
+    def _parseLayer(self, value):
+        m = LAYER_RE.match(value)
+        idx, quadratic, name, _ = m.groups()
+        idx = int(idx)
+        quadratic = bool(int(quadratic))
+        name = SFDReadUTF7(name)
+        if idx == 1:
+            self._layers[idx] = self._font.layers.defaultLayer
+        else:
+            self._layers[idx] = name
+        self._layerType[idx] = quadratic
+
+    def _parseWeightWidthSlopeOnly(self, value):
+        info = self._font.info
+        if int(value):
+            if not info.openTypeOS2Selection:
+                info.openTypeOS2Selection = []
+            info.openTypeOS2Selection += [8]
+
+    def _parseUseTypoMetrics(self, value):
+        info = self._font.info
+        if not info.openTypeOS2Selection:
+            info.openTypeOS2Selection = []
+        info.openTypeOS2Selection += [7]
+
+    def _parseOffsetMetric(self, key, value):
+        if int(value):
+            self._offsetMetrics.append(self._OFFSET_METRICS[key])
+
+    def _parsePrivateSection(self, value, stream):
+        section = self._getSection(stream, "EndPrivate", value)
+        self._parsePrivateDict(section)
+
+    def _parseGridSection(self, value, stream):
+        grid = self._getSection(stream, "EndSplineSet")
+        self._parseGrid(grid)
+
+    def _parseCharsSection(self, value, reader):
+        self._buildLayers()
+        if self._lazy:
+            self._indexChars(reader)
+            return
+
+        sections = reader.sections(b"StartChar:", b"EndChar", b"EndChars")
+        if self._jobs > 1:
+            chars = self._parseCharsParallel(_parseCharsChunk, list(sections))
+        else:
+            chars = (self._parseCharBlock(reader.decode(*s)) for s in sections)
+        self._addChars(chars)
+
+    # Header keys that need more than setting a font info attribute.
+    _HEADER_KEYS = {
+        "UComments": _parseUComments,
+        "FontLog": _parseFontLog,
+        "Version": _parseVersion,
+        "ItalicAngle": _parseItalicAngle,
+        "LayerCount": _parseLayerCount,
+        "Layer": _parseLayer,
+        "OS2_WeightWidthSlopeOnly": _parseWeightWidthSlopeOnly,
+        "OS2_UseTypoMetrics": _parseUseTypoMetrics,
+        "LangName": _parseNames,
+        "GaspTable": _parseGaspTable,
+        "Lookup": _parseLookup,
+        "AnchorClass2": _parseAnchorClass,
+    }
+
+    # Header keys that start a multi-line section, their handlers consume the
+    # section lines from the stream.
+    _SECTION_KEYS = {
+        "BeginPrivate": _parsePrivateSection,
+        "BeginChars": _parseCharsSection,
+        "Grid": _parseGridSection,
+        "KernClass2": _parseKernClass,
+    }
+
+    def _parseHeader(self, stream):
+        info = self._font.info
+
+        key, _, value = next(stream, "").partition(":")
+        if key.strip() != "SplineFontDB":
+            raise Exception("Not an SFD file.")
+        version = float(value)
+        if version != 3.0:
+            raise Exception("Unsupported SFD version: %f" % version)
+
+        for line in stream:
+            key, sep, value = line.partition(":")
+            key = key.strip()
+            value = value.strip() if sep else None
+
+            if key in self._INFO_KEYS:
+                attr, convert = self._INFO_KEYS[key]
+                if convert is not None:
+                    value = convert(value)
+                setattr(info, attr, value)
+            elif key in self._HEADER_KEYS:
+                self._HEADER_KEYS[key](self, value)
+            elif key in self._SECTION_KEYS:
+                self._SECTION_KEYS[key](self, value, stream)
             elif key in self._OFFSET_METRICS:
-                if int(value):
-                    offsetMetrics.append(self._OFFSET_METRICS[key])
-            elif key == "OS2SubXSize":
-                info.openTypeOS2SubscriptXSize = int(value)
-            elif key == "OS2SubYSize":
-                info.openTypeOS2SubscriptYSize = int(value)
-            elif key == "OS2SubXOff":
-                info.openTypeOS2SubscriptXOffset = int(value)
-            elif key == "OS2SubYOff":
-                info.openTypeOS2SubscriptYOffset = int(value)
-            elif key == "OS2SupXSize":
-                info.openTypeOS2SuperscriptXSize = int(value)
-            elif key == "OS2SupYSize":
-                info.openTypeOS2SuperscriptYSize = int(value)
-            elif key == "OS2SupXOff":
-                info.openTypeOS2SuperscriptXOffset = int(value)
-            elif key == "OS2SupYOff":
-                info.openTypeOS2SuperscriptYOffset = int(value)
-            elif key == "OS2StrikeYSize":
-                info.openTypeOS2StrikeoutSize = int(value)
-            elif key == "OS2StrikeYPos":
-                info.openTypeOS2StrikeoutPosition = int(value)
-            elif key == "OS2CapHeight":
-                info.capHeight = int(value)
-            elif key == "OS2XHeight":
-                info.xHeight = int(value)
-            elif key == "UniqueID":
-                info.postscriptUniqueID = int(value)
-            elif key == "LangName":
-                self._parseNames(value)
-            elif key == "GaspTable":
-                self._parseGaspTable(value)
-            elif key == "BeginPrivate":
-                section, i = self._getSection(data, i, "EndPrivate", value)
-                self._parsePrivateDict(section)
-            elif key == "BeginChars":
-                charData, i = self._getSection(data, i, "EndChars")
-            elif key == "Grid":
-                grid, i = self._getSection(data, i, "EndSplineSet")
-                self._parseGrid(grid)
-            elif key == "KernClass2":
-                i = self._parseKernClass(data, i, value)
-            elif key == "Lookup":
-                self._parseLookup(value)
-            elif key == "AnchorClass2":
-                self._parseAnchorClass(value)
-            elif key == "XUID":
-                pass # XXX
-            elif key == "UnicodeInterp":
-                pass # XXX
-            elif key == "NameList":
-                pass # XXX
-            elif key == "DEI":
-                pass
+                self._parseOffsetMetric(key, value)
             elif key == "EndSplineFont":
                 break
 
            #else:
            #    print(key, value)
 
-
+    def _buildLayers(self):
         for idx, name in enumerate(self._layers):
             if not isinstance(name, (str, unicode)):
                 continue
             if idx not in (0, 1) and self._layers.count(name) != 1:
                 # FontForge layer names are not unique, make sure ours are.
                 name += "_%d" % idx
-            self._layers[idx] = font.newLayer(name)
+            if name in self._font.layers:
+                # Updating a font converted before.
+                self._layers[idx] = self._font.layers[name]
+            else:
+                self._layers[idx] = self._font.newLayer(name)
 
-        if isdir:
-            assert charData is None
-            import glob
-            charData = []
-            for filename in glob.iglob(os.path.join(self._path, '*.glyph')):
-                with open(filename) as fp:
-                    charData += fp.readlines()
+    def _parseFont(self):
+        if os.path.isdir(self._path):
+            props = os.path.join(self._path, "font.props")
+            if not os.path.isfile(props):
+                raise Exception("Not an SFD directory")
+            with _SFDReader(props) as reader:
+                self._parseHeader(reader)
+            self._buildLayers()
+            if self._lazy:
+                self._indexGlyphFiles()
+            else:
+                # Each glyph file is read and parsed on its own, so with
+                # multiple jobs both the I/O and the parsing are spread over
+                # the worker processes.
+                files = _glyphFiles(self._path)
+                if self._jobs > 1:
+                    chars = self._parseCharsParallel(_parseGlyphFiles, files)
+                else:
+                    chars = (self._parseCharBlock(_readGlyphFile(f))
+                             for f in files)
+                self._addChars(chars)
+        else:
+            with _SFDReader(self._path) as reader:
+                self._parseHeader(reader)
+
+    def index(self):
+        """Parse the font header and index the glyphs without parsing them.
+
+        Returns a LazyGlyphSet, glyphs are parsed into the font when first
+        accessed. The kerning, the feature file and the other font-wide data
+        that need all the glyphs are only generated by parse(), which then
+        parses only the glyphs that were not accessed.
+        """
+        self._lazy = True
+        self._parseFont()
+        return LazyGlyphSet(self)
+
+    # Parser state filled by _parseFont(), beside the glyphs and font info,
+    # that is stored in the parse cache.
+    _CACHED_STATE = ("_layerType", "_anchorClasses", "_kernClasses",
+                     "_gsubLookups", "_gposLookups", "_lookupInfo",
+                     "_offsetMetrics")
+
+    def _getParsedData(self):
+        """Return the result of _parseFont() as plain data for the cache."""
+        info = self._font.info
+        data = dict((k, getattr(self, k)) for k in self._CACHED_STATE)
+        data["info"] = info.getDataForSerialization()
+        data["guidelines"] = [dict(g) for g in info.guidelines]
+        data["layers"] = [l if l is None else l.name for l in self._layers]
+        data["chars"] = self._chars
+        return data
+
+    def _setParsedData(self, data):
+        """Restore the result of _parseFont() from the cache."""
+        info = self._font.info
+        info.setDataFromSerialization(data["info"])
+        for guideline in data["guidelines"]:
+            info.appendGuideline(guideline)
+        for key in self._CACHED_STATE:
+            setattr(self, key, data[key])
+        for lookup, (_, _, features) in self._lookupInfo.items():
+            self._lookupLangSystems[lookup] = _flattenFeatures(features)
+
+        self._layers = data["layers"]
+        if len(self._layers) > 1 and self._layers[1] is not None:
+            self._layers[1] = self._font.layers.defaultLayer
+        self._buildLayers()
+
+        self._addChars(data["chars"])
+
+    def _discardParsedData(self, layerOrder, glyphOrder):
+        """Undo a partial _setParsedData(), for parsing the font instead.
+        layerOrder and glyphOrder are those of the font before."""
+        font = self._font
+        for layer in self._layers:
+            if layer is None or isinstance(layer, (str, unicode)):
+                continue
+            for name in list(layer.keys()):
+                del layer[name]
+            if layer.name not in layerOrder:
+                del font.layers[layer.name]
+        font.glyphOrder = glyphOrder
+        self._clearFontData()
+        self._initState()
+
+    def _parseFontCached(self):
+        cache = self._cache
+        key = cache.key(self._path, ignore_uvs=self._ignore_uvs,
+                        ufo_anchors=self._use_ufo_anchors)
+        data = cache.get(key)
+        if data is not None:
+            font = self._font
+            layerOrder = list(font.layers.layerOrder)
+            glyphOrder = list(font.glyphOrder)
+            try:
+                self._setParsedData(data)
+            except Exception:
+                # An entry that unpickles but has broken data, parse the font
+                # again.
+                self._discardParsedData(layerOrder, glyphOrder)
+                data = None
+        if data is None:
+            self._parseFont()
+            cache.put(key, self._getParsedData())
+
+    def glyphHashes(self):
+        """Return a hash of the SFD data of each glyph, after index(), for
+        detecting the glyphs that changed since an earlier conversion."""
+        # Glyphs are parsed differently with these options.
+        salt = tobytes(repr((self._ignore_uvs, self._layerType)))
+
+        hashes = OrderedDict()
+        for record, data in self._readRecords(self._glyphIndex.values()):
+            digest = hashlib.sha1(salt)
+            digest.update(data)
+            hashes[record.name] = digest.hexdigest()
+        return hashes
+
+    def glyphData(self):
+        """Return the data of each parsed glyph that goes into the font-wide
+        data, to be passed back to parse() for unchanged glyphs. Only kept
+        with keep_glyph_data."""
+        return self._glyphData
+
+    def _clearFontData(self):
+        """Reset the font-wide data of a font converted before, as they are
+        rebuilt from scratch."""
+        font = self._font
+        info = font.info
+        defaults = info.__class__().getDataForSerialization()
+        for key in info.getDataForSerialization():
+            setattr(info, key, defaults.get(key))
+        info.clearGuidelines()
+        font.kerning.clear()
+        font.groups.clear()
+        font.features.text = None
+
+    def _parseFontIncremental(self, reuse):
+        font = self._font
+        self._keepGlyphData = True
+
+        self._clearFontData()
+        self._lazy = True
+        self._parseFont()
+        self._lazy = False
+
+        with phase(self._hooks, "chars"), notificationsDisabled(font):
+            for record in self._glyphRecords:
+                name = record.name
+                if name in reuse:
+                    self._addCharData(reuse[name])
+                    continue
+                for layer in font.layers:
+                    if name in layer:
+                        del layer[name]
+                self._addChar(self._parseCharBlock(self._readRecord(record)))
+
+    def _parseUnloaded(self):
+        """Parse the glyphs of an indexed font that were not accessed yet,
+        and collect the font-wide data of all of them."""
+        font = self._font
+        self._lazy = False
+
+        loaded = self._loadedChars
+        with phase(self._hooks, "chars"), notificationsDisabled(font):
+            for record in self._glyphRecords:
+                name = record.name
+                if name in loaded:
+                    self._addCharData(loaded.pop(name))
+                else:
+                    char = self._parseCharBlock(self._readRecord(record))
+                    self._addChar(char)
+
+    def parse(self, reuse=None):
+        """Parse the font.
+
+        To update a font converted before instead, pass its glyphData() as
+        reuse, limited to the glyphs that did not change since (see
+        glyphHashes()). Only the other glyphs are then parsed and replaced,
+        while the font-wide data are rebuilt. The glyph order must not have
+        changed. This implies keep_glyph_data.
+
+        After index(), the header is not parsed again and only the glyphs
+        that were not accessed yet are parsed; reuse and the cache are not
+        supported then.
+        """
+        if self._lazy and reuse is not None:
+            raise ValueError("reuse can not be used after index()")
+
+        hooks = self._hooks
+        with phase(hooks, "header"):
+            if self._lazy:
+                self._parseUnloaded()
+            elif reuse is not None:
+                self._parseFontIncremental(reuse)
+            elif self._cache is not None:
+                self._parseFontCached()
+            else:
+                self._parseFont()
 
-        self._parseChars(charData)
+        font = self._font
+        info = font.info
 
-        # We can’t insert the references while parsing the glyphs since
-        # FontForge uses glyph indices so we need to know the glyph order
-        # first.
-        self._processReferences()
+        with notificationsDisabled(font):
+            # We can’t insert the references while parsing the glyphs since
+            # FontForge uses glyph indices so we need to know the glyph order
+            # first.
+            with phase(hooks, "references"):
+                self._processReferences()
 
-        # Same for kerning.
-        self._processKerns()
+            # Same for kerning.
+            with phase(hooks, "kerns"):
+                self._processKerns()
 
         # We process all kern classes together so we can detect UFO group
         # overlap issue and act accordingly.
-        subtables = []
-        for lookup in self._gposLookups:
-            for subtable in self._gposLookups[lookup]:
-                if subtable in self._kernClasses:
-                    subtables.append(self._kernClasses[subtable])
-        processKernClasses(self._font, subtables)
+        with phase(hooks, "kernClasses"):
+            subtables = []
+            for lookup in self._gposLookups:
+                for subtable in self._gposLookups[lookup]:
+                    if subtable in self._kernClasses:
+                        subtables.append(self._kernClasses[subtable])
+            processKernClasses(self._font, subtables)
 
         # Need to run after parsing glyphs so that we can calculate font
         # bounding box.
-        self._fixOffsetMetrics(offsetMetrics)
-
-        self._writeGSUBGPOS(isgpos=False)
-        self._writeGSUBGPOS(isgpos=True)
-        self._writeGDEF()
+        with phase(hooks, "offsetMetrics"):
+            self._fixOffsetMetrics(self._offsetMetrics)
+
+        # The feature file is built from a list of chunks and set once, as
+        # growing features.text would copy it and notify its observers each
+        # time. Its syntax tree has no reference cycles.
+        with phase(hooks, "features"), gcPaused():
+            if self._fea_ast:
+                from fontTools.feaLib import ast
+                fea = self.featureFile = ast.FeatureFile()
+                writeGSUBGPOS = self._buildGSUBGPOS
+                writeGDEF = self._buildGDEF
+            else:
+                text = font.features.text
+                fea = ["\n" if text is None else text]
+                writeGSUBGPOS = self._writeGSUBGPOS
+                writeGDEF = self._writeGDEF
+            with phase(hooks, "gsub"):
+                writeGSUBGPOS(fea, isgpos=False)
+            with phase(hooks, "gpos"):
+                writeGSUBGPOS(fea, isgpos=True)
+            with phase(hooks, "gdef"):
+                writeGDEF(fea)
+            if not self._fea_ast:
+                font.features.text = "".join(fea)
 
         # FontForge does not have an explicit UPEM setting, it is the sum of its
         # ascender and descender.
@@ -1263,3 +2195,56 @@ class SFDParser():
             elif info.postscriptWeightName:
                 value = info.postscriptWeightName
             info.styleName = value
+
+
+class LazyGlyphSet(Mapping):
+    """Maps glyph names to glyphs of an indexed SFD font, parsing each glyph
+    on first access."""
+
+    def __init__(self, parser):
+        self._parser = parser
+        self._font = parser._font
+
+    @property
+    def records(self):
+        """List of GlyphRecord, in glyph order."""
+        return list(self._parser._glyphIndex.values())
+
+    def __getitem__(self, name):
+        if name in self._font:
+            return self._font[name]
+        if name not in self._parser._glyphIndex:
+            raise KeyError(name)
+        return self._parser._loadGlyph(name)
+
+    def __contains__(self, name):
+        return name in self._parser._glyphIndex
+
+    def __iter__(self):
+        return iter(self._parser._glyphIndex)
+
+    def __len__(self):
+        return len(self._parser._glyphIndex)
+
+
+# Worker process state for SFDParser._parseCharsParallel().
+_charsWorker = None
+
+
+def _initCharsWorker(path, ignore_uvs, layerType):
+    global _charsWorker
+    _charsWorker = SFDParser(path, None, ignore_uvs)
+    _charsWorker._layerType = layerType
+    if not os.path.isdir(path):
+        _charsWorker._reader = _SFDReader(path)
+
+
+def _parseCharsChunk(sections):
+    parser = _charsWorker
+    return [parser._parseCharBlock(parser._reader.decode(*s))
+            for s in sections]
+
+
+def _parseGlyphFiles(filenames):
+    parser = _charsWorker
+    return [parser._parseCharBlock(_readGlyphFile(f)) for f in filenames]
@@ -2,14 +2,37 @@
 # encoding: utf-8
 
 from __future__ import print_function, division
-from fontTools.misc.py23 import *
 
-from ufoLib.validators import groupsValidator
+import gc
+import glob
+import os
+
+from contextlib import contextmanager
+
+try:
+    from functools import lru_cache
+except ImportError: # Python 2
+    def lru_cache(maxsize=128):
+        return lambda func: func
+
+try:
+    unichr
+except NameError: # Python 3
+    unichr = chr
 
 SFDLIB_PREFIX = "org.sfdlib"
 GLYPHCLASS_KEY = SFDLIB_PREFIX + ".glyphclass"
 DECOMPOSEREMOVEOVERLAP_KEY = SFDLIB_PREFIX + ".decomposeAndRemoveOverlap"
 
+def inputFiles(path):
+    """Return the files making up an SFD file or SFDIR directory."""
+    if os.path.isdir(path):
+        files = [os.path.join(path, "font.props")]
+        files += sorted(glob.glob(os.path.join(path, "*.glyph")))
+        return files
+    return [path]
+
+
 def parseVersion(version):
     versionMajor = ""
     versionMinor = ""
@@ -88,7 +111,59 @@ def kernClassesToUFO(subtables, prefix="public"):
 
     return groups, kerning
 
+def _rebuildUnicodeData(layer):
+    """Rebuild the Unicode values to glyph names map of layer, if defcon
+    built it already; it is otherwise built from the glyphs when first
+    used."""
+    unicodeData = layer._unicodeData
+    if unicodeData is None:
+        return
+    cmap = {}
+    for glyph in layer:
+        for code in glyph.unicodes:
+            cmap.setdefault(code, []).append(glyph.name)
+    unicodeData.clear()
+    unicodeData.update(cmap)
+
+
+@contextmanager
+def notificationsDisabled(font):
+    """Disable the defcon notifications of font and all its sub-objects, for
+    building it in bulk when nobody is observing it. The Unicode values to
+    glyph names maps of the layers are rebuilt afterwards, but anything else
+    defcon keeps in sync through notifications, like the glyph order, has to
+    be set by the caller."""
+    dispatcher = font.dispatcher
+    dispatcher.disableNotifications()
+    try:
+        yield
+    finally:
+        dispatcher.enableNotifications()
+    for layer in font.layers:
+        _rebuildUnicodeData(layer)
+
+
+@contextmanager
+def gcPaused():
+    """Pause the cyclic garbage collector, for building many objects that
+    hold no reference cycles. The collections their allocation triggers
+    would otherwise walk all the objects of the font again and again."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
 def processKernClasses(font, subtables):
+    if not subtables:
+        return
+
+    # Only fonts with kern classes need ufoLib’s validators.
+    from ufoLib.validators import groupsValidator
+
     groups, kerning = kernClassesToUFO(subtables)
     valid, _ = groupsValidator(groups)
     if not valid:
@@ -129,9 +204,18 @@ def SFDReadUTF7(data):
     codec.
     """
 
-    out = b""
+    data = data.strip('"')
+    if "+" not in data:
+        # Nothing encoded, which is the case for most strings.
+        return data
+    return _decodeUTF7(data)
+
+
+@lru_cache(maxsize=1024)
+def _decodeUTF7(data):
+    out = bytearray()
 
-    data = data.strip('"').encode("ascii")
+    data = data.encode("ascii")
 
     if data and not isinstance(data[0], int): # Python 2
         data = [ord(c) for c in data]
@@ -0,0 +1,78 @@
+#
+# encoding: utf-8
+
+from __future__ import print_function, division
+
+import os
+import sys
+import time
+
+from .incremental import updateUFO
+from .instrument import PhaseMemory, PhaseTimer
+from .utils import inputFiles
+
+
+def _snapshot(path):
+    """Return the names, sizes and modification times of the files making up
+    an SFD file or SFDIR directory."""
+    state = []
+    for filename in inputFiles(path):
+        try:
+            st = os.stat(filename)
+        except OSError:
+            continue
+        state.append((filename, st.st_size, st.st_mtime))
+    return state
+
+
+def watch(pairs, interval=0.5, ignore_uvs=False, ufo_anchors=False,
+          out=None, timings=False, memory=False):
+    """Poll a list of (sfdPath, ufoPath) pairs and update each UFO with
+    updateUFO() whenever its SFD changes, reporting the time each update
+    took to out, sys.stdout by default. Runs until interrupted.
+
+    With timings or memory, the PhaseTimer or PhaseMemory report of each
+    update follows its line.
+
+    A font is converted once it hasn’t changed for a whole interval, so that
+    fonts still being saved are not read.
+    """
+    if out is None:
+        out = sys.stdout
+    current = {}
+    pending = {}
+    while True:
+        for sfdPath, ufoPath in pairs:
+            state = _snapshot(sfdPath)
+            if not state or state == current.get(sfdPath):
+                continue
+            if pending.get(sfdPath) != state:
+                pending[sfdPath] = state
+                continue
+            del pending[sfdPath]
+            current[sfdPath] = state
+
+            hooks = []
+            if timings:
+                hooks.append(PhaseTimer())
+            if memory:
+                hooks.append(PhaseMemory())
+
+            start = time.time()
+            try:
+                changed = updateUFO(sfdPath, ufoPath, ignore_uvs, ufo_anchors,
+                                    hooks)
+            except Exception as e:
+                print("%s FAILED: %s: %s" % (sfdPath, type(e).__name__, e),
+                      file=out)
+            else:
+                print("%s -> %s: %d glyphs updated in %.3fs" % (
+                      sfdPath, ufoPath, len(changed), time.time() - start),
+                      file=out)
+            finally:
+                if memory:
+                    hooks[-1].stop()
+            for hook in hooks:
+                hook.report(out)
+            out.flush()
+        time.sleep(interval)
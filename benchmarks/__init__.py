@@ -0,0 +1 @@
+"""Benchmarks for sfdLib, see the individual modules for how to run them."""
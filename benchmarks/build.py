@@ -0,0 +1,174 @@
+"""Time building OpenType fonts straight from SFD fonts against going
+through a UFO on disk.
+
+Fonts are generated with benchmarks.gensfd, then each one is built in a
+fresh interpreter both ways. The direct path builds the feature syntax tree
+while parsing and compiles the in-memory font. The two-step path saves the
+parsed font as a UFO, loads it back and compiles that, with ufo2ft when it
+is available, otherwise the same way as the direct path. The median of each
+phase over the runs is printed and, optionally, written to a JSON file.
+
+The random rules of fonts much smaller than the default sizes may conflict,
+which feaLib rejects.
+
+Usage: python -m benchmarks.build [--sizes 1000,10000] [--ttf] [--json FILE]
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from . import gensfd
+from .run import LIBDIR, ROOT, _median
+
+
+def _hasUfo2ft():
+    try:
+        import ufo2ft
+    except ImportError:
+        return False
+    return True
+
+
+def measure(path, ttf=False, direct=True):
+    """Build path in this process, the direct or the two-step way, and return
+    the wall time of each phase in seconds."""
+    sys.path.insert(0, LIBDIR)
+    from defcon import Font
+    from sfdLib.build import buildFont
+    from sfdLib.instrument import PhaseTimer, phase
+    from sfdLib.parser import SFDParser
+
+    timer = PhaseTimer(countObjects=False)
+    hooks = [timer]
+    out = tempfile.mkdtemp()
+    try:
+        font = Font()
+        parser = SFDParser(path, font, hooks=hooks, fea_ast=direct)
+        parser.parse()
+
+        if direct:
+            otf = buildFont(font, parser.featureFile, ttf, hooks)
+        else:
+            ufo = os.path.join(out, "font.ufo")
+            with phase(hooks, "save"):
+                font.save(ufo)
+            with phase(hooks, "load"):
+                font = Font(ufo)
+                for glyph in font:
+                    pass
+            if _hasUfo2ft():
+                import ufo2ft
+                with phase(hooks, "compile"):
+                    if ttf:
+                        otf = ufo2ft.compileTTF(font)
+                    else:
+                        otf = ufo2ft.compileOTF(font)
+            else:
+                otf = buildFont(font, None, ttf, hooks)
+
+        with phase(hooks, "save"):
+            otf.save(os.path.join(out, "font.ttf" if ttf else "font.otf"))
+    finally:
+        shutil.rmtree(out)
+
+    times = dict((name, record[0]) for name, record in timer.phases.items())
+    times["total"] = sum(times.values())
+    return times
+
+
+def _measureInChild(path, ttf, direct):
+    cmd = [sys.executable, "-m", "benchmarks.build", "--child", path]
+    if ttf:
+        cmd.append("--ttf")
+    if not direct:
+        cmd.append("--two-step")
+    out = subprocess.check_output(cmd, cwd=ROOT, universal_newlines=True)
+    return json.loads(out)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="benchmarks.build",
+        description="Time building OpenType fonts with and without a UFO.")
+    parser.add_argument("--sizes", default="1000,10000",
+                        help="comma separated glyph counts, up to 65535 "
+                             "(default: 1000,10000)")
+    parser.add_argument("-n", "--runs", type=int, default=3,
+                        help="number of runs per font (default: 3)")
+    parser.add_argument("--ttf", action="store_true",
+                        help="build TrueType instead of CFF outlines")
+    parser.add_argument("--workdir", metavar="DIR",
+                        help="keep the generated fonts in DIR and reuse them")
+    parser.add_argument("--json", metavar="FILE",
+                        help="also write the results to FILE")
+    parser.add_argument("-p", "--points", type=int, default=16)
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument("--composites", type=float, default=0.2)
+    parser.add_argument("--kerns", type=int, default=2)
+    parser.add_argument("--kern-classes", metavar="NxM",
+                        type=gensfd._kernClasses, default=(10, 10))
+    parser.add_argument("--lookups", type=int, default=6)
+    parser.add_argument("--anchor-classes", type=int, default=2)
+    parser.add_argument("--quadratic", action="store_true")
+    parser.add_argument("--child", metavar="FONT", help=argparse.SUPPRESS)
+    parser.add_argument("--two-step", action="store_true",
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(args)
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.ttf, not args.two_step)))
+        return
+
+    fontOptions = dict(points=args.points, layers=args.layers,
+                       composites=args.composites, kerns=args.kerns,
+                       kernClasses=list(args.kern_classes),
+                       lookups=args.lookups,
+                       anchorClasses=args.anchor_classes,
+                       quadratic=args.quadratic, sfdir=False)
+    results = dict(python=sys.version.split()[0], options=fontOptions,
+                   ttf=args.ttf, ufo2ft=_hasUfo2ft(), results=[])
+
+    workdir = args.workdir or tempfile.mkdtemp()
+    if not os.path.isdir(workdir):
+        os.makedirs(workdir)
+    try:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            path = os.path.join(workdir, "font-%d.sfd" % size)
+            if not os.path.exists(path):
+                gensfd.generate(path, size, **fontOptions)
+
+            medians = {}
+            for name, direct in (("direct", True), ("two-step", False)):
+                runs = [_measureInChild(path, args.ttf, direct)
+                        for _ in range(args.runs)]
+                median = dict((k, _median([r[k] for r in runs]))
+                              for k in runs[0])
+                medians[name] = median
+                results["results"].append(dict(glyphs=size, path=name,
+                                               runs=runs, median=median))
+
+                phases = sorted((k for k in median if k != "total"),
+                                key=lambda k: -median[k])
+                print("%6d glyphs, %s: %.3fs (%s)" % (
+                    size, name, median["total"],
+                    ", ".join("%s %.3f" % (k, median[k]) for k in phases)))
+            print("%6d glyphs, direct is %.1fx faster" % (
+                size, medians["two-step"]["total"] / medians["direct"]["total"]))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir)
+
+    if args.json:
+        with open(args.json, "w") as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
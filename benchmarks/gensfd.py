@@ -0,0 +1,360 @@
+"""Generate synthetic SFD fonts for benchmarking.
+
+The output only depends on the options, so the same command always produces
+the same font.
+
+Usage: python -m benchmarks.gensfd [options] OUTPUT
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import random
+
+# Lookup types cycled through by the generated lookups, with the feature tag
+# they are registered for.
+_LOOKUP_TYPES = [
+    (1, "ss%02d"),  # Single substitution
+    (2, "ccmp"),    # Multiple substitution
+    (3, "salt"),    # Alternate substitution
+    (4, "liga"),    # Ligature substitution
+    (257, "sups"),  # Single positioning
+    (258, "kern"),  # Pair positioning
+]
+
+_HEADER = """\
+SplineFontDB: 3.0
+FontName: Benchmark-Regular
+FullName: Benchmark Regular
+FamilyName: Benchmark
+Weight: Regular
+Copyright: Generated by sfdLib benchmarks
+Version: 1.000
+ItalicAngle: 0
+UnderlinePosition: -100
+UnderlineWidth: 50
+Ascent: 800
+Descent: 200
+sfntRevision: 0x00010000
+LayerCount: {layerCount}
+{layers}
+FSType: 0
+OS2Version: 0
+OS2_WeightWidthSlopeOnly: 0
+OS2_UseTypoMetrics: 1
+CreationTime: 1500000000
+ModificationTime: 1500000000
+PfmFamily: 17
+TTFWeight: 400
+TTFWidth: 5
+LineGap: 90
+VLineGap: 0
+OS2TypoAscent: 800
+OS2TypoAOffset: 0
+OS2TypoDescent: -200
+OS2TypoDOffset: 0
+OS2TypoLinegap: 90
+OS2WinAscent: 0
+OS2WinAOffset: 1
+OS2WinDescent: 0
+OS2WinDOffset: 1
+HheadAscent: 0
+HheadAOffset: 1
+HheadDescent: 0
+HheadDOffset: 1
+OS2CapHeight: 700
+OS2XHeight: 500
+OS2Vendor: 'PfEd'
+{lookups}
+MarkAttachClasses: 1
+DEI: 91125
+{kernClass}
+LangName: 1033 "" "" "" "" "" "" "" "" "" "" "" "" "" "" "" "" "Benchmark"
+Encoding: UnicodeFull
+UnicodeInterp: none
+NameList: AGL For New Fonts
+DisplaySize: -48
+AntiAlias: 1
+FitToEm: 0
+WinInfo: 0 32 23
+BeginPrivate: 3
+BlueValues 15 [-10 0 500 510]
+StemSnapV 7 [80 90]
+StdVW 4 [80]
+EndPrivate
+{anchorClasses}
+"""
+
+
+class _Generator(object):
+
+    def __init__(self, glyphs=1000, points=16, layers=2, composites=0.2,
+                 kerns=2, kernClasses=(0, 0), lookups=6, anchorClasses=2,
+                 quadratic=False, seed=0):
+        if not 1 <= glyphs <= 65535:
+            raise ValueError("glyphs must be between 1 and 65535")
+        if layers < 2:
+            raise ValueError("layers must be at least 2")
+        self.glyphs = glyphs
+        self.points = points
+        self.layers = layers
+        self.composites = composites
+        self.kerns = kerns
+        self.kernClasses = kernClasses
+        self.lookups = lookups
+        self.anchorClasses = anchorClasses
+        self.quadratic = quadratic
+        self.seed = seed
+        self.names = [".notdef"] + ["g%d" % i for i in range(1, glyphs)]
+
+    def _random(self, *args):
+        # A generator per item, so that changing one option does not change
+        # the rest of the font.
+        return random.Random(repr((self.seed,) + args))
+
+    def _name(self, rnd):
+        return self.names[rnd.randrange(1, self.glyphs)] if self.glyphs > 1 \
+            else self.names[0]
+
+    def header(self):
+        quadratic = int(self.quadratic)
+        layers = ['Layer: 0 %d "Back" 1' % quadratic,
+                  'Layer: 1 %d "Fore" 0' % quadratic]
+        for i in range(2, self.layers):
+            layers.append('Layer: %d %d "Layer %d" 0' % (i, quadratic, i))
+
+        lookups = []
+        for i in range(self.lookups):
+            kind, tag = _LOOKUP_TYPES[i % len(_LOOKUP_TYPES)]
+            if "%" in tag:
+                tag = tag % (i // len(_LOOKUP_TYPES) % 20 + 1)
+            lookups.append(
+                "Lookup: %d 0 0 \"lookup %d\" { \"subtable %d\"  } "
+                "['%s' ('DFLT' <'dflt' > 'latn' <'dflt' 'TRK ' > ) ]"
+                % (kind, i, i, tag))
+        subtables = []
+        if self.kerns:
+            subtables.append('"kern pairs"')
+        if all(self.kernClasses):
+            subtables.append('"kern classes"')
+        if subtables:
+            lookups.append(
+                "Lookup: 258 0 0 \"kerning\" { %s  } "
+                "['kern' ('DFLT' <'dflt' > 'latn' <'dflt' > ) ]"
+                % " ".join(subtables))
+        if self.anchorClasses:
+            lookups.append(
+                "Lookup: 260 0 0 \"marks\" { \"mark subtable\"  } "
+                "['mark' ('DFLT' <'dflt' > 'latn' <'dflt' > ) ]")
+
+        kernClass = ""
+        if all(self.kernClasses):
+            kernClass = self.kernClass()
+
+        anchorClasses = ""
+        if self.anchorClasses:
+            anchorClasses = "AnchorClass2: " + " ".join(
+                '"anchor %d" "mark subtable"' % i
+                for i in range(self.anchorClasses))
+
+        return _HEADER.format(layerCount=self.layers,
+                              layers="\n".join(layers),
+                              lookups="\n".join(lookups),
+                              kernClass=kernClass,
+                              anchorClasses=anchorClasses)
+
+    def kernClass(self):
+        first, second = self.kernClasses
+        rnd = self._random("kernClass")
+
+        # Split the glyphs into disjoint classes for each side.
+        lines = ['KernClass2: %d %d "kern classes"' % (first, second)]
+        for count in (first, second):
+            names = self.names[1:]
+            rnd.shuffle(names)
+            size = max(1, len(names) // count)
+            for i in range(1, count):
+                members = " ".join(names[(i - 1) * size:i * size])
+                lines.append(" %d %s" % (len(members), members))
+        lines.append(" ".join("%d {}" % (rnd.randint(-50, 50) if rnd.random()
+                                         < 0.3 else 0)
+                              for _ in range(first * second)))
+        return "\n".join(lines)
+
+    def _contours(self, rnd, count):
+        lines = ["SplineSet"]
+        for _ in range(count):
+            x0, y0 = rnd.randint(0, 500), rnd.randint(0, 700)
+            lines.append("%d %d m 1" % (x0, y0))
+            for _ in range(self.points - 1):
+                x, y = rnd.randint(0, 500), rnd.randint(0, 700)
+                if self.quadratic:
+                    cx, cy = rnd.randint(0, 500), rnd.randint(0, 700)
+                    lines.append(" %d %d %d %d %d %d c %d"
+                                 % (cx, cy, cx, cy, x, y, rnd.choice([0, 1])))
+                elif rnd.random() < 0.5:
+                    lines.append(" %d %d l %d" % (x, y, rnd.choice([0, 1])))
+                else:
+                    lines.append(" %d %d %d %d %d %d c %d" % (
+                        rnd.randint(0, 500), rnd.randint(0, 700),
+                        rnd.randint(0, 500), rnd.randint(0, 700),
+                        x, y, rnd.choice([0, 1])))
+            lines.append(" %d %d l 1" % (x0, y0))
+        lines.append("EndSplineSet")
+        return lines
+
+    def glyph(self, gid):
+        rnd = self._random("glyph", gid)
+        name = self.names[gid]
+        lines = ["StartChar: %s" % name]
+        if gid:
+            uni = 0xF0000 + gid
+            lines.append("Encoding: %d %d %d" % (uni, uni, gid))
+        else:
+            lines.append("Encoding: 65536 -1 0")
+        lines.append("Width: %d" % rnd.randint(200, 800))
+        lines.append("Flags: W")
+
+        for i in range(self.anchorClasses):
+            if gid and gid % self.anchorClasses == i:
+                kind = "mark" if gid % 5 == 0 else "basechar"
+                lines.append('AnchorPoint: "anchor %d" %d %d %s 0'
+                             % (i, rnd.randint(0, 500), rnd.randint(0, 700),
+                                kind))
+
+        composite = gid > 2 and rnd.random() < self.composites
+        lines.append("LayerCount: %d" % self.layers)
+        lines.append("Fore")
+        if composite:
+            for _ in range(2):
+                ref = rnd.randrange(1, gid)
+                lines.append("Refer: %d %d N 1 0 0 1 %d %d 2"
+                             % (ref, 0xF0000 + ref, rnd.randint(0, 300),
+                                rnd.randint(0, 300)))
+        else:
+            lines += self._contours(rnd, 2)
+
+        if gid and self.kerns:
+            lines.append("Kerns2: " + " ".join(
+                '%d %d "kern pairs" ' % (rnd.randrange(1, self.glyphs),
+                                         -rnd.randint(1, 100))
+                for _ in range(self.kerns)))
+
+        for i in range(self.lookups):
+            if not gid or (gid + i) % 4:
+                continue
+            kind = _LOOKUP_TYPES[i % len(_LOOKUP_TYPES)][0]
+            subtable = '"subtable %d"' % i
+            if kind == 1:
+                rule = "Substitution2: %s %s" % (subtable, self._name(rnd))
+            elif kind == 2:
+                rule = "MultipleSubs2: %s %s %s" % (subtable, self._name(rnd),
+                                                   self._name(rnd))
+            elif kind == 3:
+                rule = "AlternateSubs2: %s %s %s" % (subtable, self._name(rnd),
+                                                    self._name(rnd))
+            elif kind == 4:
+                rule = "Ligature2: %s %s %s" % (subtable, self._name(rnd),
+                                               self._name(rnd))
+            elif kind == 257:
+                rule = "Position2: %s dx=0 dy=%d dh=0 dv=0" % (
+                    subtable, rnd.randint(1, 300))
+            else:
+                rule = "PairPos2: %s %s dx=0 dy=0 dh=%d dv=0 " \
+                       "dx=0 dy=0 dh=0 dv=0" % (subtable, self._name(rnd),
+                                                -rnd.randint(1, 100))
+            lines.append(rule)
+
+        for i in range(2, self.layers):
+            if gid % 3 == 0 and not composite:
+                lines.append("Layer: %d" % i)
+                lines += self._contours(rnd, 1)
+
+        lines.append("EndChar")
+        return "\n".join(lines) + "\n"
+
+
+def generate(path, glyphs=1000, points=16, layers=2, composites=0.2, kerns=2,
+             kernClasses=(0, 0), lookups=6, anchorClasses=2, quadratic=False,
+             sfdir=False, seed=0):
+    """Write a synthetic font to path, as an SFD file or, if sfdir is true,
+    an SFDIR directory.
+
+    glyphs: number of glyphs, up to 65535.
+    points: number of points per contour, glyphs have two contours.
+    layers: number of layers, including the background and foreground ones.
+    composites: fraction of the glyphs that are made of two references.
+    kerns: number of Kerns2 pairs per glyph.
+    kernClasses: number of (first, second) classes of a KernClass2 subtable,
+        or (0, 0) for none.
+    lookups: number of GSUB and GPOS lookups, cycling through their types,
+        each glyph has a rule in a quarter of them.
+    anchorClasses: number of anchor classes of a mark lookup.
+    """
+    generator = _Generator(glyphs, points, layers, composites, kerns,
+                           kernClasses, lookups, anchorClasses, quadratic,
+                           seed)
+    if sfdir:
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        with open(os.path.join(path, "font.props"), "w") as fp:
+            fp.write(generator.header())
+            fp.write("EndSplineFont\n")
+        for gid, name in enumerate(generator.names):
+            filename = name.replace(".", "_") + ".glyph"
+            with open(os.path.join(path, filename), "w") as fp:
+                fp.write(generator.glyph(gid))
+    else:
+        with open(path, "w") as fp:
+            fp.write(generator.header())
+            fp.write("BeginChars: 1114112 %d\n" % glyphs)
+            for gid in range(glyphs):
+                fp.write("\n")
+                fp.write(generator.glyph(gid))
+            fp.write("EndChars\n")
+            fp.write("EndSplineFont\n")
+
+
+def _kernClasses(value):
+    first, _, second = value.partition("x")
+    return int(first), int(second or first)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="gensfd", description="Generate a synthetic SFD font.")
+    parser.add_argument("output", metavar="OUTPUT",
+                        help="SFD file or SFDIR directory to write")
+    parser.add_argument("-g", "--glyphs", type=int, default=1000,
+                        help="number of glyphs (default: 1000)")
+    parser.add_argument("-p", "--points", type=int, default=16,
+                        help="points per contour (default: 16)")
+    parser.add_argument("--layers", type=int, default=2,
+                        help="number of layers (default: 2)")
+    parser.add_argument("--composites", type=float, default=0.2,
+                        help="fraction of composite glyphs (default: 0.2)")
+    parser.add_argument("--kerns", type=int, default=2,
+                        help="Kerns2 pairs per glyph (default: 2)")
+    parser.add_argument("--kern-classes", metavar="NxM", type=_kernClasses,
+                        default=(0, 0),
+                        help="size of a KernClass2 subtable (default: none)")
+    parser.add_argument("--lookups", type=int, default=6,
+                        help="number of GSUB/GPOS lookups (default: 6)")
+    parser.add_argument("--anchor-classes", type=int, default=2,
+                        help="number of anchor classes (default: 2)")
+    parser.add_argument("--quadratic", action="store_true",
+                        help="use quadratic instead of cubic outlines")
+    parser.add_argument("--sfdir", action="store_true",
+                        help="write an SFDIR directory")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed (default: 0)")
+    args = parser.parse_args(args)
+
+    generate(args.output, args.glyphs, args.points, args.layers,
+             args.composites, args.kerns, args.kern_classes, args.lookups,
+             args.anchor_classes, args.quadratic, args.sfdir, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Measure sfdLib startup time with python -X importtime.
+
+Each module is imported in a fresh interpreter several times, and the median
+cumulative import time is reported along with the imports that contribute the
+most to it. The wall time of `sfd2ufo --help` is measured the same way.
+
+Usage: python benchmarks/importtime.py [-n RUNS] [--json FILE] [MODULE ...]
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+LIBDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Lib")
+MODULES = ["sfdLib.__main__", "sfdLib.parser"]
+
+
+def _environ():
+    env = dict(os.environ)
+    path = [os.path.normpath(LIBDIR)]
+    if env.get("PYTHONPATH"):
+        path.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(path)
+    return env
+
+
+def importTime(module):
+    """Import module in a fresh interpreter and return a list of (name,
+    self, cumulative) times in microseconds, in import order."""
+    cmd = [sys.executable, "-X", "importtime", "-c", "import " + module]
+    proc = subprocess.Popen(cmd, env=_environ(), stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    _, err = proc.communicate()
+    if proc.returncode:
+        raise RuntimeError("importing %s failed:\n%s" % (module, err))
+
+    times = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times.append((name.rstrip(), int(own), int(cumulative)))
+    return times
+
+
+def helpTime():
+    """Return the wall time of `sfd2ufo --help` in seconds."""
+    cmd = [sys.executable, "-m", "sfdLib", "--help"]
+    with open(os.devnull, "w") as devnull:
+        start = time.time()
+        subprocess.check_call(cmd, env=_environ(), stdout=devnull)
+    return time.time() - start
+
+
+def _median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure sfdLib startup time.")
+    parser.add_argument("modules", metavar="MODULE", nargs="*",
+                        default=MODULES, help="modules to import (default: %s)"
+                        % " ".join(MODULES))
+    parser.add_argument("-n", "--runs", type=int, default=5,
+                        help="number of runs per module (default: 5)")
+    parser.add_argument("--top", type=int, default=10,
+                        help="number of slowest imports to list (default: 10)")
+    parser.add_argument("--json", metavar="FILE",
+                        help="also write the results to FILE")
+    args = parser.parse_args()
+
+    results = dict(python=sys.version.split()[0], modules={})
+    for module in args.modules:
+        # The first run may have to write bytecode caches.
+        importTime(module)
+        runs = [importTime(module) for _ in range(args.runs)]
+        total = _median([run[-1][2] for run in runs])
+
+        # Imports of the median run, by their own time.
+        run = [r for r in runs if r[-1][2] == total][0]
+        slowest = sorted(run, key=lambda t: -t[1])[:args.top]
+
+        print("%s: %.1f ms" % (module, total / 1000.))
+        for name, own, cumulative in slowest:
+            print("  %8.1f ms  %8.1f ms  %s" % (own / 1000.,
+                                                cumulative / 1000., name))
+        results["modules"][module] = dict(
+            total=total,
+            slowest=[dict(name=name.strip(), self=own, cumulative=cumulative)
+                     for name, own, cumulative in slowest])
+
+    helpTime()
+    results["help"] = _median([helpTime() for _ in range(args.runs)])
+    print("sfd2ufo --help: %.1f ms" % (results["help"] * 1000))
+
+    if args.json:
+        with open(args.json, "w") as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
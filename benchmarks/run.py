@@ -0,0 +1,166 @@
+"""Time the phases of converting synthetic fonts of increasing size.
+
+Fonts are generated with benchmarks.gensfd, then each one is converted in a
+fresh interpreter, timing the phases reported by SFDParser.parse() and the
+saving of the UFO. The median of each phase over the runs is printed and,
+optionally, written to a JSON file. The FontForge based parser is timed as
+well when its Python module is available.
+
+Usage: python -m benchmarks.run [--sizes 100,1000,10000] [--json FILE]
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from . import gensfd
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
+LIBDIR = os.path.join(ROOT, "Lib")
+
+
+def measure(parserName, path, jobs=1):
+    """Convert path with the given parser in this process, and return the
+    wall time of each phase in seconds."""
+    sys.path.insert(0, LIBDIR)
+    from defcon import Font
+    from sfdLib.instrument import PhaseTimer, phase
+    if parserName == "native":
+        from sfdLib.native import SFDParser
+    else:
+        from sfdLib.parser import SFDParser
+
+    timer = PhaseTimer(countObjects=False)
+    hooks = [timer]
+    font = Font()
+    if parserName == "native":
+        parser = SFDParser(path, font, hooks=hooks)
+    else:
+        parser = SFDParser(path, font, jobs=jobs, hooks=hooks)
+    parser.parse()
+
+    out = tempfile.mkdtemp(suffix=".ufo")
+    try:
+        with phase(hooks, "save"):
+            font.save(out)
+    finally:
+        shutil.rmtree(out)
+
+    times = dict((name, record[0]) for name, record in timer.phases.items())
+    times["total"] = sum(times.values())
+    return times
+
+
+def _measureInChild(parserName, path, jobs):
+    cmd = [sys.executable, "-m", "benchmarks.run", "--child", parserName,
+           path, "--jobs", str(jobs)]
+    out = subprocess.check_output(cmd, cwd=ROOT, universal_newlines=True)
+    return json.loads(out)
+
+
+def _hasFontForge():
+    try:
+        import fontforge
+    except ImportError:
+        return False
+    return True
+
+
+def _median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="benchmarks.run", description="Time converting synthetic fonts.")
+    parser.add_argument("--sizes", default="100,1000,10000",
+                        help="comma separated glyph counts, up to 65535 "
+                             "(default: 100,1000,10000)")
+    parser.add_argument("-n", "--runs", type=int, default=3,
+                        help="number of runs per font (default: 3)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="worker processes of the Python parser "
+                             "(default: 1)")
+    parser.add_argument("--parsers", default=None,
+                        help="comma separated parsers to time, python and "
+                             "native (default: all available)")
+    parser.add_argument("--workdir", metavar="DIR",
+                        help="keep the generated fonts in DIR and reuse them")
+    parser.add_argument("--json", metavar="FILE",
+                        help="also write the results to FILE")
+    parser.add_argument("--sfdir", action="store_true",
+                        help="generate SFDIR directories")
+    parser.add_argument("-p", "--points", type=int, default=16)
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument("--composites", type=float, default=0.2)
+    parser.add_argument("--kerns", type=int, default=2)
+    parser.add_argument("--kern-classes", metavar="NxM",
+                        type=gensfd._kernClasses, default=(10, 10))
+    parser.add_argument("--lookups", type=int, default=6)
+    parser.add_argument("--anchor-classes", type=int, default=2)
+    parser.add_argument("--quadratic", action="store_true")
+    parser.add_argument("--child", nargs=2, metavar=("PARSER", "FONT"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(args)
+
+    if args.child:
+        print(json.dumps(measure(args.child[0], args.child[1], args.jobs)))
+        return
+
+    if args.parsers:
+        parsers = args.parsers.split(",")
+    else:
+        parsers = ["python"]
+        if _hasFontForge():
+            parsers.append("native")
+
+    fontOptions = dict(points=args.points, layers=args.layers,
+                       composites=args.composites, kerns=args.kerns,
+                       kernClasses=list(args.kern_classes),
+                       lookups=args.lookups,
+                       anchorClasses=args.anchor_classes,
+                       quadratic=args.quadratic, sfdir=args.sfdir)
+    results = dict(python=sys.version.split()[0], options=fontOptions,
+                   jobs=args.jobs, results=[])
+
+    workdir = args.workdir or tempfile.mkdtemp()
+    if not os.path.isdir(workdir):
+        os.makedirs(workdir)
+    try:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            name = "font-%d.%s" % (size, "sfdir" if args.sfdir else "sfd")
+            path = os.path.join(workdir, name)
+            if not os.path.exists(path):
+                gensfd.generate(path, size, **fontOptions)
+
+            for parserName in parsers:
+                runs = [_measureInChild(parserName, path, args.jobs)
+                        for _ in range(args.runs)]
+                median = dict((k, _median([r[k] for r in runs]))
+                              for k in runs[0])
+                results["results"].append(dict(glyphs=size, parser=parserName,
+                                               runs=runs, median=median))
+
+                phases = sorted((k for k in median if k != "total"),
+                                key=lambda k: -median[k])
+                print("%6d glyphs, %s: %.3fs (%s)" % (
+                    size, parserName, median["total"],
+                    ", ".join("%s %.3f" % (k, median[k]) for k in phases)))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir)
+
+    if args.json:
+        with open(args.json, "w") as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
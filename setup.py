@@ -1,8 +1,15 @@
+import os
+import re
+
 from setuptools import setup
 
+# The version is kept in the package, read it without importing it.
+with open(os.path.join("Lib", "sfdLib", "__init__.py")) as fp:
+    version = re.search(r'^__version__ = "(.*)"', fp.read(), re.M).group(1)
+
 setup(
     name = "sfdLib",
-    version = "1.0",
+    version = version,
     description = "A simple, quick and dirty, SFD to UFO converter.",
     author = "Khaled Hosny",
     author_email = "khaledhosny@eglug.org",
@@ -17,6 +24,25 @@ setup(
         'console_scripts': ['sfd2ufo = sfdLib.__main__:main'],
     },
     package_dir = {'': 'Lib'},
+    extras_require = {
+        # Building OpenType fonts straight from SFD fonts, see sfdLib.build.
+        "build": [
+            "fonttools >= 4.7; python_version >= '3'",
+            "fonttools; python_version < '3'",
+            "cu2qu; python_version < '3'",
+        ],
+        # Faster decoding of glyph outlines.
+        "numpy": [
+            "numpy",
+        ],
+        # The scripts in benchmarks/, which time both of the above.
+        "benchmarks": [
+            "fonttools >= 4.7; python_version >= '3'",
+            "fonttools; python_version < '3'",
+            "cu2qu; python_version < '3'",
+            "numpy",
+        ],
+    },
     classifiers = [
         "Development Status :: 4 - Beta",
         "Environment :: Console",
@@ -0,0 +1,92 @@
+from __future__ import print_function, division
+
+import pytest
+
+from defcon import Font
+from fontTools.misc.fixedTools import otRound
+
+from sfdLib.build import buildFont
+from sfdLib.parser import SFDParser
+
+
+def _kernGroups(font, side):
+    prefix = "public.kern%d." % side
+    groups = {}
+    for name, members in font.groups.items():
+        if name.startswith(prefix):
+            for glyph in members:
+                groups[glyph] = name
+    return groups
+
+
+def _ufoKerning(font, first, second):
+    """Return the UFO kerning of a glyph pair."""
+    firstGroup = _kernGroups(font, 1).get(first)
+    secondGroup = _kernGroups(font, 2).get(second)
+    for pair in [(first, second), (first, secondGroup),
+                 (firstGroup, second), (firstGroup, secondGroup)]:
+        if pair in font.kerning:
+            return font.kerning[pair]
+    return 0
+
+
+def _gposKerning(ttFont, first, second):
+    """Return the advance adjustment of the first pair positioning subtable
+    of the kern feature that covers a glyph pair."""
+    gpos = ttFont["GPOS"].table
+    lookups = []
+    for record in gpos.FeatureList.FeatureRecord:
+        if record.FeatureTag == "kern":
+            lookups += [i for i in record.Feature.LookupListIndex
+                        if i not in lookups]
+    for index in lookups:
+        for subtable in gpos.LookupList.Lookup[index].SubTable:
+            if first not in subtable.Coverage.glyphs:
+                continue
+            if subtable.Format == 1:
+                pairSet = subtable.PairSet[
+                    subtable.Coverage.glyphs.index(first)]
+                for record in pairSet.PairValueRecord:
+                    if record.SecondGlyph == second:
+                        return getattr(record.Value1, "XAdvance", 0)
+            else:
+                class1 = subtable.ClassDef1.classDefs.get(first, 0)
+                class2 = subtable.ClassDef2.classDefs.get(second, 0)
+                record = subtable.Class1Record[class1].Class2Record[class2]
+                return getattr(record.Value1, "XAdvance", 0)
+    return 0
+
+
+@pytest.mark.parametrize("ttf", [False, True], ids=["cff", "ttf"])
+def test_build_font(sfdPath, ttf):
+    font = Font()
+    SFDParser(sfdPath, font).parse()
+    # Only the kern feature made from the UFO kerning.
+    font.features.text = None
+
+    ttFont = buildFont(font, ttf=ttf)
+    assert ("glyf" if ttf else "CFF ") in ttFont
+
+    glyphOrder = [n for n in font.glyphOrder if n != ".notdef"]
+    assert ttFont.getGlyphOrder() == [".notdef"] + glyphOrder
+
+    cmap = {}
+    for name in glyphOrder:
+        for uv in font[name].unicodes:
+            cmap.setdefault(uv, name)
+    assert cmap and ttFont.getBestCmap() == cmap
+
+    hmtx = ttFont["hmtx"]
+    for name in glyphOrder:
+        assert hmtx[name][0] == otRound(font[name].width)
+
+    # A glyph pair for each UFO kerning pair, whether of glyphs or groups.
+    pairs = []
+    for first, second in font.kerning.keys():
+        first = font.groups.get(first, [first])[0]
+        second = font.groups.get(second, [second])[0]
+        pairs.append((first, second))
+    assert any(f in font.groups for f, _ in font.kerning.keys())
+    for first, second in pairs:
+        assert _gposKerning(ttFont, first, second) == \
+            otRound(_ufoKerning(font, first, second))
@@ -0,0 +1,72 @@
+from __future__ import print_function, division
+
+import os
+import pickle
+
+import pytest
+
+from defcon import Font
+
+from sfdLib import cache as cacheModule
+from sfdLib.cache import ParseCache
+from sfdLib.parser import SFDParser
+
+
+def _convert(sfdPath, ufoPath, cache=None):
+    font = Font()
+    SFDParser(sfdPath, font, cache=cache).parse()
+    font.save(ufoPath)
+
+
+def _key(cache, sfdPath):
+    return cache.key(sfdPath, ignore_uvs=False, ufo_anchors=False)
+
+
+def test_round_trip(sfdPath, tmp_path, ufoContents, monkeypatch):
+    cache = ParseCache(str(tmp_path / "cache"))
+    fresh = str(tmp_path / "fresh.ufo")
+    cached = str(tmp_path / "cached.ufo")
+    _convert(sfdPath, fresh)
+    _convert(sfdPath, str(tmp_path / "filling.ufo"), cache)
+    assert cache.get(_key(cache, sfdPath)) is not None
+
+    def parseFont(self):
+        raise AssertionError("the font was parsed again")
+    monkeypatch.setattr(SFDParser, "_parseFont", parseFont)
+    _convert(sfdPath, cached, cache)
+
+    assert ufoContents(fresh) == ufoContents(cached)
+
+
+def test_broken_entry(sfdPath, tmp_path, ufoContents):
+    cache = ParseCache(str(tmp_path / "cache"))
+    key = _key(cache, sfdPath)
+    fresh = str(tmp_path / "fresh.ufo")
+    cached = str(tmp_path / "cached.ufo")
+    _convert(sfdPath, fresh, cache)
+
+    # An entry that fails after the glyphs and layers are added.
+    data = cache.get(key)
+    data["chars"].append(None)
+    cache.put(key, data)
+    _convert(sfdPath, cached, cache)
+
+    assert ufoContents(fresh) == ufoContents(cached)
+    # The entry was replaced.
+    assert None not in cache.get(key)["chars"]
+
+
+def test_format_in_key(sfdPath, tmp_path, monkeypatch):
+    cache = ParseCache(str(tmp_path / "cache"))
+    key = _key(cache, sfdPath)
+    monkeypatch.setattr(cacheModule, "CACHE_FORMAT",
+                        cacheModule.CACHE_FORMAT + 1)
+    assert _key(cache, sfdPath) != key
+
+
+def test_failed_put(tmp_path):
+    path = str(tmp_path / "cache")
+    cache = ParseCache(path)
+    with pytest.raises((pickle.PicklingError, AttributeError, TypeError)):
+        cache.put("key", dict(unpicklable=lambda: None))
+    assert os.listdir(path) == []
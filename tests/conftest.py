@@ -0,0 +1,37 @@
+import os
+import sys
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Test the sources, and use the benchmarks font generator for test fonts.
+sys.path.insert(0, os.path.join(ROOT, "Lib"))
+sys.path.insert(0, ROOT)
+
+import pytest
+
+
+def _ufoContents(path):
+    """Return the contents of the files of a UFO, by their relative path."""
+    contents = {}
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            filename = os.path.join(dirpath, filename)
+            with open(filename, "rb") as fp:
+                contents[os.path.relpath(filename, path)] = fp.read()
+    return contents
+
+
+@pytest.fixture
+def ufoContents():
+    return _ufoContents
+
+
+@pytest.fixture(params=[False, True], ids=["sfd", "sfdir"])
+def sfdPath(request, tmp_path):
+    """A synthetic font with layers, lookups, kern classes and anchors, as an
+    SFD file and as an SFDIR directory."""
+    from benchmarks import gensfd
+    path = str(tmp_path / ("font.sfdir" if request.param else "font.sfd"))
+    gensfd.generate(path, glyphs=120, points=8, layers=3, kernClasses=(6, 4),
+                    lookups=12, anchorClasses=2, sfdir=request.param)
+    return path
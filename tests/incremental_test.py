@@ -0,0 +1,43 @@
+from __future__ import print_function, division
+
+import os
+import re
+
+from sfdLib.incremental import updateUFO
+
+
+def _editGlyph(sfdPath, name):
+    """Make a glyph wider and taller than the others, changing the font
+    bounds as well."""
+    if os.path.isdir(sfdPath):
+        path = os.path.join(sfdPath, name + ".glyph")
+        with open(path) as fp:
+            data = fp.read()
+        start, end = 0, len(data)
+    else:
+        path = sfdPath
+        with open(path) as fp:
+            data = fp.read()
+        start = data.index("StartChar: %s\n" % name)
+        end = data.index("EndChar", start)
+    glyph = re.sub(r"Width: \d+", "Width: 1234", data[start:end])
+    glyph = re.sub(r"\n(-?\d+) -?\d+ m", r"\n\1 2000 m", glyph, count=1)
+    assert glyph != data[start:end]
+    with open(path, "w") as fp:
+        fp.write(data[:start] + glyph + data[end:])
+
+
+def test_update(sfdPath, tmp_path, ufoContents):
+    updated = str(tmp_path / "updated.ufo")
+    full = str(tmp_path / "full.ufo")
+    assert len(updateUFO(sfdPath, updated)) == 120
+    fontinfo = ufoContents(updated)["fontinfo.plist"]
+
+    _editGlyph(sfdPath, "g10")
+    assert updateUFO(sfdPath, updated) == ["g10"]
+    updateUFO(sfdPath, full)
+
+    contents = ufoContents(full)
+    # The font bounds changed.
+    assert contents["fontinfo.plist"] != fontinfo
+    assert ufoContents(updated) == contents
@@ -0,0 +1,103 @@
+from __future__ import print_function, division
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from sfdLib import __main__, instrument
+from sfdLib.__main__ import convertBatch, _readBatchFile
+
+
+def test_memory_limit_unsupported(monkeypatch, capsys):
+    monkeypatch.setattr(instrument, "resource", None)
+    monkeypatch.setattr(sys, "argv", ["sfd2ufo", "--memory-limit", "100",
+                                      "font.sfd", "font.ufo"])
+    with pytest.raises(SystemExit) as e:
+        __main__.main()
+    assert e.value.code == 2
+    assert "not supported on this platform" in capsys.readouterr().err
+
+    with pytest.raises(RuntimeError):
+        instrument.limitMemory(100 * 1024 * 1024)
+
+
+@pytest.mark.skipif(not instrument.canLimitMemory(),
+                    reason="memory limits are not supported")
+@pytest.mark.parametrize("ext", [".ufo", ".otf"])
+def test_memory_limit(sfdPath, tmp_path, ext):
+    # Run in a subprocess, the limit can not be lifted once set.
+    lib = os.path.join(os.path.dirname(__file__), "..", "Lib")
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(lib))
+    output = str(tmp_path / ("font" + ext))
+    subprocess.check_call([sys.executable, "-m", "sfdLib", "--memory-limit",
+                           "100", sfdPath, output], env=env)
+    assert os.path.exists(output)
+
+
+def test_read_batch_file(tmp_path):
+    batch = tmp_path / "fonts.txt"
+    batch.write_text(u"""# Fonts to convert
+a.sfd a.ufo
+
+  "My Font.sfd"  'My Font.ufo'
+b.sfdir out/b.ttf # Built to OpenType
+""")
+    assert _readBatchFile(str(batch)) == [
+        ("a.sfd", "a.ufo"),
+        ("My Font.sfd", "My Font.ufo"),
+        ("b.sfdir", "out/b.ttf"),
+    ]
+
+
+@pytest.mark.parametrize("line", ["a.sfd", "a.sfd a.ufo b.ufo"])
+def test_read_batch_file_error(tmp_path, line):
+    batch = tmp_path / "fonts.txt"
+    batch.write_text(u"# Fonts\n" + line + u"\n")
+    with pytest.raises(ValueError) as e:
+        _readBatchFile(str(batch))
+    assert str(e.value).endswith("fonts.txt:2: expected an input and an "
+                                 "output font")
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_convert_batch(sfdPath, tmp_path, jobs):
+    missing = str(tmp_path / "missing.sfd")
+    pairs = [
+        (sfdPath, str(tmp_path / "first.ufo")),
+        (missing, str(tmp_path / "missing.ufo")),
+        (sfdPath, str(tmp_path / "last.ufo")),
+    ]
+    results = convertBatch(pairs, jobs)
+
+    assert [r[:2] for r in results] == pairs
+    assert [r[3] is None for r in results] == [True, False, True]
+    assert os.path.isdir(pairs[0][1]) and os.path.isdir(pairs[2][1])
+    assert not os.path.exists(pairs[1][1])
+
+
+def test_batch_exit_status(sfdPath, tmp_path, monkeypatch, capsys):
+    batch = tmp_path / "fonts.txt"
+    batch.write_text(u"%s ok.ufo\nmissing.sfd missing.ufo\n" % sfdPath)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["sfd2ufo", "--batch", str(batch)])
+    with pytest.raises(SystemExit) as e:
+        __main__.main()
+    assert e.value.code == 1
+
+    out = capsys.readouterr().out
+    assert "missing.sfd FAILED" in out
+    assert "1 converted, 1 failed" in out
+    assert os.path.isdir(str(tmp_path / "ok.ufo"))
+
+
+def test_glob_without_matches(tmp_path, monkeypatch):
+    output = tmp_path / "out"
+    monkeypatch.setattr(sys, "argv", ["sfd2ufo", "--glob",
+                                      str(tmp_path / "*.sfd"), "-o",
+                                      str(output)])
+    with pytest.raises(SystemExit) as e:
+        __main__.main()
+    assert e.value.code == 2
+    assert not output.exists()
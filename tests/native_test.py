@@ -0,0 +1,19 @@
+from __future__ import print_function, division
+
+import pytest
+
+from defcon import Font
+
+pytest.importorskip("fontforge")
+
+from sfdLib.native import SFDParser
+
+
+def test_feature_ast(sfdPath):
+    font = Font()
+    font.features.text = "# Existing features\n"
+    parser = SFDParser(sfdPath, font, fea_ast=True)
+    parser.parse()
+
+    assert font.features.text == "# Existing features\n"
+    assert parser.featureFile.statements
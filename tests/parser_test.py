@@ -0,0 +1,224 @@
+# encoding: utf-8
+
+from __future__ import print_function, division
+
+import os
+
+import pytest
+
+from defcon import Font
+from fontTools.misc.py23 import UnicodeIO
+
+from sfdLib import parser as parserModule
+from sfdLib.parser import SFDParser, _decodeCoordinates
+
+
+def _convert(sfdPath, ufoPath, **kwargs):
+    font = Font()
+    SFDParser(sfdPath, font, **kwargs).parse()
+    font.save(ufoPath)
+    return font
+
+
+def test_parallel_parsing(sfdPath, tmp_path, ufoContents):
+    serial = str(tmp_path / "serial.ufo")
+    parallel = str(tmp_path / "parallel.ufo")
+    _convert(sfdPath, serial, jobs=1)
+    font = _convert(sfdPath, parallel, jobs=3)
+
+    assert len(font.layers) == 3
+    assert font.kerning and font.groups and font.features.text
+    assert ufoContents(serial) == ufoContents(parallel)
+
+
+def test_sanitize_lookup_names():
+    # Lookup kind, name, features and the name it had before sanitizing was
+    # made linear, in the order the names are asked for.
+    kern = "'kern' ('DFLT' <'dflt' > 'latn' <'dflt' > )"
+    lookups = [
+        (258, "'kern' Kerning lookup 0", kern, "kernKerninglookup0"),
+        (258, "1'kern' Kerning lookup 0", kern, "pos_pair_kernlatn_0"),
+        (258, "'kern' Kerning lookup 1", kern, "kernKerninglookup1"),
+        (258, "1'kern' Kerning lookup 1", kern, "pos_pair_kernlatn_2"),
+        (258, "kernKerninglookup1", "'kern' ('latn' <'dflt' > )",
+         "pos_pair_kernlatn_4"),
+        (4, "'liga' Ligatures", "'liga' ('arab' <'dflt' > )",
+         "ligaLigatures"),
+        (4, "liga Ligatures!", "'liga' ('arab' <'dflt' > )",
+         "sub_ligature_ligaarab_0"),
+        (1, "sub_single_smcplatn_0", "'smcp' ('latn' <'dflt' > )",
+         "sub_single_smcplatn_0"),
+        (1, "'smcp' Small Capitals", "'smcp' ('latn' <'dflt' > )",
+         "smcpSmallCapitals"),
+        (1, "'smcp' Small: Capitals", "'smcp' ('latn' <'dflt' > )",
+         "sub_single_smcplatn_2"),
+        (1, "9" + "x" * 70, "", "x" * 63),
+        (1, "x" * 70, "", "sub_single__0"),
+        (260, u"élève", "'mark' ('DFLT' <'dflt' > )", "lve"),
+        (260, u"lève", "", "pos_mark2base__0"),
+    ]
+
+    parser = SFDParser("font.sfd", Font())
+    for kind, name, features, _ in lookups:
+        parser._parseLookup('%d 0 0 "%s" { "subtable"  } [%s ]'
+                            % (kind, name, features))
+    for kind, name, _, expected in lookups:
+        assert parser._santizeLookupName(name, kind >> 8) == expected
+    # Names are remembered.
+    assert parser._santizeLookupName("1'kern' Kerning lookup 0") == \
+        "pos_pair_kernlatn_0"
+
+
+@pytest.fixture(params=[True, False], ids=["numpy", "python"])
+def numpy(request, monkeypatch):
+    """Decode coordinates with and without NumPy."""
+    if request.param:
+        pytest.importorskip("numpy")
+        monkeypatch.setattr(parserModule, "_numpy", None)
+    else:
+        monkeypatch.setattr(parserModule, "_numpy", False)
+    return request.param
+
+
+def test_decode_coordinates(numpy):
+    coords = _decodeCoordinates("1 -2.5  3e2\t0.125 -0 7", 6)
+    assert coords.typecode == "d"
+    assert list(coords) == [1, -2.5, 300, 0.125, 0, 7]
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+@pytest.mark.parametrize("data, count", [
+    ("1 2 x 4", 4),
+    ("1 2 3", 4),
+    ("1 2 3 4 5", 4),
+])
+def test_decode_malformed_coordinates(numpy, data, count):
+    with pytest.raises(ValueError):
+        _decodeCoordinates(data, count)
+
+
+def test_parse_spline_set(numpy):
+    parser = SFDParser("font.sfd", Font())
+    contours = parser._parseSplineSet([
+        "0 0 m 1",
+        " 0 100 l 1",
+        " 50 150 100 150 100 100 c 0",
+        'Named: "foo"',
+    ])
+    assert len(contours) == 1
+    contour = contours[0]
+    assert contour.name == "foo"
+    assert list(contour.coords) == [0, 0, 0, 100, 50, 150, 100, 150, 100, 100]
+
+
+@pytest.mark.parametrize("lines", [
+    # The total count is right, but not that of each segment.
+    ["0 0 m 1", " 0 100 100 l 1", " 100 l 1"],
+    ["0 0 m 1", " 0 100 100 100 100 c 0", " 100 0 l 1"],
+])
+def test_parse_malformed_spline_set(numpy, lines):
+    parser = SFDParser("font.sfd", Font())
+    with pytest.raises(ValueError):
+        parser._parseSplineSet(lines)
+
+
+def test_decode_with_and_without_numpy(sfdPath, tmp_path, ufoContents,
+                                       monkeypatch):
+    pytest.importorskip("numpy")
+    withNumpy = str(tmp_path / "numpy.ufo")
+    withoutNumpy = str(tmp_path / "python.ufo")
+    monkeypatch.setattr(parserModule, "_numpy", None)
+    _convert(sfdPath, withNumpy)
+    monkeypatch.setattr(parserModule, "_numpy", False)
+    _convert(sfdPath, withoutNumpy)
+
+    assert ufoContents(withNumpy) == ufoContents(withoutNumpy)
+
+
+def test_unicode_data(sfdPath):
+    font = Font()
+    # Built before the glyphs are added with the notifications disabled.
+    assert font.unicodeData.glyphNameForUnicode(0xF0005) is None
+    SFDParser(sfdPath, font).parse()
+
+    assert font.unicodeData.glyphNameForUnicode(0xF0005) == "g5"
+    assert font["g5"].unicodes == [0xF0005]
+
+
+def test_lazy_glyph_set(sfdPath):
+    expected = Font()
+    SFDParser(sfdPath, expected).parse()
+
+    font = Font()
+    glyphs = SFDParser(sfdPath, font).index()
+    assert len(glyphs) == len(expected)
+    assert list(glyphs) == expected.glyphOrder
+    assert [r.name for r in glyphs.records] == expected.glyphOrder
+    assert "g5" in glyphs and "nonexistent" not in glyphs
+    assert len(font) == 0
+
+    glyph = glyphs["g5"]
+    assert list(font.keys()) == ["g5"]
+    assert glyph.unicodes == [0xF0005]
+    assert glyph.width == expected["g5"].width
+    assert len(glyph) == len(expected["g5"])
+    assert glyphs["g5"] is glyph
+    with pytest.raises(KeyError):
+        glyphs["nonexistent"]
+
+
+def test_index_then_parse(sfdPath, tmp_path, ufoContents):
+    expected = str(tmp_path / "expected.ufo")
+    indexed = str(tmp_path / "indexed.ufo")
+    _convert(sfdPath, expected)
+
+    font = Font()
+    parser = SFDParser(sfdPath, font)
+    glyphs = parser.index()
+    glyphs["g5"]
+    glyphs["g30"]
+    parser.parse()
+    font.save(indexed)
+
+    assert ufoContents(expected) == ufoContents(indexed)
+
+    parser = SFDParser(sfdPath, Font())
+    parser.index()
+    with pytest.raises(ValueError):
+        parser.parse(reuse={})
+
+
+def _buildLayoutTables(font, featureFile):
+    from fontTools.feaLib.builder import Builder
+    from fontTools.ttLib import TTFont
+
+    ttFont = TTFont()
+    ttFont.setGlyphOrder(font.glyphOrder)
+    Builder(ttFont, featureFile).build()
+    return dict((tag, ttFont[tag].compile(ttFont))
+                for tag in ("GSUB", "GPOS", "GDEF"))
+
+
+def test_feature_ast(sfdPath):
+    from fontTools.feaLib.parser import Parser
+
+    font = Font()
+    SFDParser(sfdPath, font).parse()
+    text = Parser(UnicodeIO(font.features.text), glyphNames=font.keys())
+
+    astFont = Font()
+    parser = SFDParser(sfdPath, astFont, fea_ast=True)
+    parser.parse()
+
+    assert _buildLayoutTables(astFont, parser.featureFile) == \
+        _buildLayoutTables(font, text.parse())
+
+
+def test_feature_ast_keeps_features_text(sfdPath):
+    font = Font()
+    font.features.text = "# Existing features\n"
+    parser = SFDParser(sfdPath, font, fea_ast=True)
+    parser.parse()
+
+    assert font.features.text == "# Existing features\n"
+    assert parser.featureFile.statements
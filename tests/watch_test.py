@@ -0,0 +1,40 @@
+from __future__ import print_function, division
+
+import pytest
+
+from sfdLib import watch as watchModule
+
+
+def _watch(monkeypatch, pairs, **kwargs):
+    sleeps = []
+
+    def sleep(interval):
+        # The font is converted on the second poll, once it is unchanged.
+        sleeps.append(interval)
+        if len(sleeps) == 2:
+            raise KeyboardInterrupt
+    monkeypatch.setattr(watchModule.time, "sleep", sleep)
+
+    with pytest.raises(KeyboardInterrupt):
+        watchModule.watch(pairs, interval=0.1, **kwargs)
+
+
+def test_watch(sfdPath, tmp_path, monkeypatch, capsys):
+    ufoPath = str(tmp_path / "font.ufo")
+    _watch(monkeypatch, [(sfdPath, ufoPath)])
+
+    out = capsys.readouterr().out
+    assert "%s -> %s: 120 glyphs updated" % (sfdPath, ufoPath) in out
+    assert "phase" not in out
+
+
+def test_watch_reports(sfdPath, tmp_path, monkeypatch, capsys):
+    ufoPath = str(tmp_path / "font.ufo")
+    _watch(monkeypatch, [(sfdPath, ufoPath)], timings=True, memory=True)
+
+    lines = capsys.readouterr().out.splitlines()
+    assert "120 glyphs updated" in lines[0]
+    headers = [l.split() for l in lines if l.startswith("phase")]
+    assert headers == [["phase", "wall", "cpu", "objects"],
+                       ["phase", "peak", "retained", "max", "rss"]]
+    assert any(l.startswith("chars ") for l in lines)